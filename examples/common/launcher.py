@@ -81,9 +81,6 @@ class _ExampleLauncher:
             # Re-load commands and re-execute them
             if args.command_file_cycle == True:
 
-                # reset objects - TODO make it cleaner - call a function e.g. .clear() ?
-                gsp.Object.objects = {}
-
                 # load commands from file
                 command_queue = gsp.io.json.load(commands_filename)
 
@@ -91,8 +88,9 @@ class _ExampleLauncher:
                 for command in command_queue:
                     gsp.log.info("%s" % command)
 
-                # execute commands using gsp_matplotlib as backend
-                command_queue.run(gsp_matplotlib)
+                # execute commands using gsp_matplotlib as backend, in
+                # a fresh namespace (independent of the original objects)
+                command_queue.run(gsp_matplotlib, namespace=gsp.Namespace())
 
                 # Display the result using matplotlib (just to debug)
                 import matplotlib.pyplot as plt
@@ -3,7 +3,7 @@
 # License: BSD 3 clause
 
 from . log import log
-from . object import Object
+from . object import Object, Namespace
 
 from . import io
 from . import core
@@ -54,38 +54,53 @@ black = [0.0, 0.0, 0.0, 1.0]
 grey  = [0.5, 0.5, 0.5, 1.0]
 white = [1.0, 1.0, 1.0, 1.0]
 
-def save(filename, format=None):
+def save(filename, format=None, **kwargs):
     """
     Save default command stack into a file. If format is not
-    specified, it is deduced from filename exension.
+    specified, it is deduced from filename exension. Extra keyword
+    arguments are passed to the saver (e.g. dedup, or threshold,
+    compression and shuffle for json). Saving to a journal (gspj)
+    only appends the commands recorded since the previous save.
     """
 
     import pathlib
-    from gsp.io import json
+    from gsp.io import json, binary, journal
     from gsp.io.command import CommandQueue
 
     format = format or pathlib.Path(filename).suffix[1:]
     if format in ["json"]:
-        json.save(filename)
+        json.save(filename, **kwargs)
+    elif format in ["gspb"]:
+        binary.save(filename, **kwargs)
+    elif format in ["gspj"]:
+        journal.save(filename, **kwargs)
     else:
         raise ValueError(f"Unknown format ({format})")
 
-def load(filename, format=None):
+def load(filename, format=None, until=None, **kwargs):
     """
     Reset the current default stack and populate it with commands from
     the given filename. If format is not specified, it is deduced from
-    filename exension.
+    filename exension. If until is given (command id), the stack is
+    populated with the commands needed to rebuild the state after this
+    command (starting from the nearest checkpoint for gspb files).
+    Extra keyword arguments are passed to the loader (e.g. decode and
+    workers for json).
     """
 
     import pathlib
-    from gsp.io import queue, json
+    from gsp.io import queue, json, binary, journal
 
-    Object.objects = {}
+    Object.objects.clear()
     queue = queue("active").empty()
 
     format = format or pathlib.Path(filename).suffix[1:]
     if format in ["json"]:
-        json.load(filename)
+        json.load(filename, until=until, **kwargs)
+    elif format in ["gspb"]:
+        binary.load(filename, until=until, **kwargs)
+    elif format in ["gspj"]:
+        journal.load(filename, until=until, **kwargs)
     else:
         raise ValueError(f"Unknown format ({format})")
 
@@ -5,7 +5,8 @@
 from . mkdocs import mkdocs
 from . command import queue, record, command
 from . convert import convert, register, unregister, converters
-from . command import CID, Command, CommandQueue
+from . command import CID, Command, CommandQueue, Dispatcher
+from . profile import Profiler
 
 
 # class save:
@@ -3,6 +3,7 @@
 # License: BSD 3 clause
 import io
 import sys
+import numpy as np
 from types import UnionType
 from typing import Union, get_args, get_origin
 from datetime import datetime
@@ -12,15 +13,105 @@ from . command import CommandQueue, Command, Converter, CID
 def bold(s): return f"\033[1m{s}\033[0m"
 def dim(s): return f"\033[2m{s}\033[0m"
 
-def dump_command(command, stream=sys.stdout):
+def summary(value):
+    """
+    Return a one line summary (type, shape, dtype, size and digest)
+    of a buffer (np.ndarray, bytes, memoryview or lazy buffer). Lazy
+    buffers are summarized from their metadata without being read.
     """
-    Dump a command to given stream in text (ansi) format
 
-    This is mostly useful for the documentatipn where the TEXT tab of
-    any commands can be dumped via markdow-exec.
+    from . json import digest, Blob, Encoded
+
+    if isinstance(value, Blob):
+        return "Blob(dtype=%s, nbytes=%d)" % (value.dtype, value.nbytes)
+    elif isinstance(value, Encoded):
+        return "Encoded(codec=%s, dtype=%s, encoded=%d)" % (
+            value.codec, value.dtype, _nbytes(value))
+    data = np.ascontiguousarray(value)
+    if isinstance(value, (bytes, memoryview)):
+        data = data.reshape(-1).view(np.ubyte)
+    return "%s(shape=%s, dtype=%s, nbytes=%d, digest=%s)" % (
+        type(value).__name__, data.shape, data.dtype, data.nbytes,
+        digest(data)[:16])
+
+def _nbytes(value):
+    """
+    Return the size of a buffer (the encoded size for an encoded
+    buffer) or None if value is not a buffer
+    """
+
+    from . json import Blob, Encoded
+
+    if isinstance(value, (np.ndarray, bytes, memoryview)):
+        return memoryview(value).nbytes
+    elif isinstance(value, Blob):
+        return value.nbytes
+    elif isinstance(value, Encoded):
+        if isinstance(value.data, str):
+            return len(value.data)*3//4
+        return _nbytes(value.data)
+    return None
+
+def format_value(value, limit=None, converted=None):
+    """
+    Return the text representation of a parameter value. Converters
+    are only called for small values and their result is stored in
+    the converted dictionary (if given) such that a value shared by
+    several parameters of a command is converted once. Buffers bigger
+    than limit are summarized and other values are truncated to limit
+    characters (no limit if None).
     """
 
-    s = ""
+    suffix = ""
+    if isinstance(value, Converter):
+        # Large buffers are summarized without being converted
+        nbytes = _nbytes(value.value)
+        if limit is not None and nbytes is not None and nbytes > limit:
+            return summary(value.value) + " (converted)"
+        converted = {} if converted is None else converted
+        key = value.converter, id(value.value)
+        if key not in converted:
+            converted[key] = value()
+        value = converted[key]
+        if isinstance(value, Object):
+            return str(value.id)
+        suffix = " (converted)"
+
+    nbytes = _nbytes(value)
+    if limit is not None and nbytes is not None and nbytes > limit:
+        return summary(value) + suffix
+    text = str(value)
+    if limit is not None and len(text) > limit:
+        text = text[:limit] + "…"
+    return text + suffix
+
+def _type_name(vtype):
+    """ Return the name of an annotated type """
+
+    if hasattr(vtype, "__name__"):
+        return vtype.__name__
+    elif isinstance(vtype, UnionType):
+        return " | ".join([str(v.__name__) for v in get_args(vtype)])
+    return str(vtype)
+
+def write_command(command, stream, limit=None, bold=bold, dim=dim):
+    """
+    Write a command to given text stream, one line at a time.
+
+    Parameters
+    ----------
+    command : Command
+        Command to write
+    stream :
+        Text stream to write to
+    limit : int
+        Size above which values are summarized (see `format_value`),
+        no summary if None
+    bold, dim :
+        Styling functions
+    """
+
+    write = stream.write
 
     # Get timestamp in date format
     date = datetime.fromtimestamp(command.timestamp)
@@ -32,66 +123,85 @@ def dump_command(command, stream=sys.stdout):
         method = command.methodname
     else:
         method = "%s/%s" % (command.classname, command.methodname)
-    s += dim("%d. " % command.id) + bold("COMMAND\n")
-    # s += "%d. " % command.id + bold("COMMAND:") + ' "%s" (str)\n' % (method)
-    s += '     - METHOD: "%s"' % (method) + dim(" (str)\n")
-    s += "     - COMMAND_ID: %s" % command.id + dim(" (int)\n")
-    s += "     - TIMESTAMP: %s" % date.strftime("%Y-%m-%dT%H:%M:%S.%f") + dim(" (datetime)\n")
-    s += dim("   PARAMETERS\n")
+    write(dim("%d. " % command.id) + bold("COMMAND\n"))
+    write('     - METHOD: "%s"' % (method) + dim(" (str)\n"))
+    write("     - COMMAND_ID: %s" % command.id + dim(" (int)\n"))
+    write("     - TIMESTAMP: %s" % date.strftime("%Y-%m-%dT%H:%M:%S.%f") + dim(" (datetime)\n"))
+    write(dim("   PARAMETERS\n"))
+
+    # Loaded commands have no annotations
+    annotations = command.annotations or {}
+    converted = {}
     for key,value in command.parameters.items():
-
         # Immediate conversion for lisibility in the documentation
-        if isinstance(value, Converter):
-            value = value()
-            if isinstance(value, Object):
-                value = value.id
-            else:
-                value = str(value) + " (converted)"
-
+        text = format_value(value, limit, converted)
         if key == "id":
-            s += "     - OBJECT_ID: %s" % value + dim(" (int)\n")
+            write("     - OBJECT_ID: %s" % text + dim(" (int)\n"))
+            continue
+
+        if key.endswith("(id)"):
+            key = key[:-4]
+            vtype = annotations.get(key, int)
+            key += "_ID"
         else:
-            if key.endswith("(id)"):
-                key = key[:-4]
-                vtype = command.annotations[key]
-                key += "_ID"
-            else:
-                vtype = command.annotations[key]
-
-            if hasattr(vtype, "__name__"):
-                vtype = vtype.__name__
-            else:
-                if isinstance(vtype, UnionType):
-                    vtype = " | ".join([str(v.__name__) for v in get_args(vtype)])
-                else:
-                    vtype = str(vtype)
-            s +="     - %s: %s" % (key.upper(), value)
-            s += dim(" (%s)\n" % (vtype))
-
-    if stream == sys.stdout:
-        print(s)
-    else:
-        return s
+            vtype = annotations.get(key, type(value))
+        write("     - %s: %s" % (key.upper(), text))
+        write(dim(" (%s)\n" % _type_name(vtype)))
 
-def dump(queue=None, filename=None):
-    """ Save command queue to a file """
+def dump_command(command, stream=None, limit=None):
+    """
+    Dump a command to given stream (default to sys.stdout) in text
+    (ansi) format.
 
-    queue = queue or CommandQueue("active")
-    commands = ""
-    for command in queue.commands:
-        commands += dump_command(command, stream=None)
-        commands += "\n"
+    This is mostly useful for the documentatipn where the TEXT tab of
+    any commands can be dumped via markdow-exec.
+    """
+
+    stream = stream or sys.stdout
+    write_command(command, stream, limit)
+    stream.write("\n")
 
+def dump(queue=None, filename=None, limit=None, write=write_command):
+    """
+    Save command queue to a file (or return it as a string if filename
+    is None). Commands are written one at a time such that dumping a
+    large queue to a file uses constant memory.
+
+    Parameters
+    ----------
+    queue : CommandQueue
+        Command queue to dump (default to the active one)
+    filename : str
+        Name of the file or text stream to write to
+    limit : int
+        Size above which values are summarized (see `format_value`),
+        no summary if None
+    write :
+        Function writing a command to a stream (see `write_command`)
+    """
+
+    queue = queue or CommandQueue("active")
     if filename is None:
-        return commands
+        stream = io.StringIO()
+    elif hasattr(filename, "write"):
+        stream = filename
     else:
-        with open(filename, "w") as stream:
-            stream.write(commands)
-
-def save(queue, filename):
+        stream = open(filename, "w")
+
+    try:
+        for command in queue.commands:
+            write(command, stream, limit)
+            stream.write("\n")
+        if filename is None:
+            return stream.getvalue()
+    finally:
+        if stream is not filename:
+            stream.close()
+
+def save(queue, filename, limit=None):
     """ Save command queue to a file """
 
-    dump(queue, filename)
+    dump(queue, filename, limit)
 
 
 def load(filename):
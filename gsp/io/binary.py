@@ -0,0 +1,542 @@
+# Package: Graphic Server Protocol
+# Authors: Nicolas P .Rougier <nicolas.rougier@gmail.com>
+# License: BSD 3 clause
+"""
+Binary command stream format (.gspb)
+
+A binary command file starts with a file header (magic and version),
+followed by one frame per command. Each frame is made of a compact JSON
+header describing the command and of the raw payloads of its buffer
+parameters (np.ndarray, bytes, memoryview):
+
+```
+file    := "GSPB" version:u32 frame* index
+frame   := header_size:u32 payload_size:u64 header [padding payload*]
+payload := raw bytes padding
+index   := "GSPX" count:u32 checkpoints:u32 cid:u64*count offset:u64*count
+           position:u64*checkpoints start:u64*(checkpoints+1) frame:u64*
+           index_size:u64 "GSPX"
+```
+
+Payloads are aligned on ALIGNMENT bytes relative to the start of the
+file and referenced from the header by their offset relative to the
+start of the frame payload area. This allows the loader to memory-map
+the file and to wrap payloads as zero-copy views. A payload identical
+to a previous one is not written again but referenced from the header
+by its absolute offset in the file (`at`).
+
+The index at the end of the file gives the id and offset of every
+command as well as periodic checkpoints. A checkpoint at a given
+position is the list of frames whose replay rebuilds the state of the
+objects after the commands preceding that position: commands of
+deleted objects and superseded renders (see `CommandQueue.compact`)
+are dropped and buffer updates are folded into frames written along
+the command frames (but not indexed as commands): the bytes changed
+since the previous checkpoint are written as a single set_data frame
+and the whole buffer is only written again once these frames outgrow
+it. Loading a file until a given command thus only replays the
+nearest checkpoint and the commands following it.
+"""
+import sys
+import mmap
+import bisect
+import json
+import struct
+import numpy as np
+from . command import CommandQueue, Command
+from . convert import convert
+from . import json as gsp_json
+
+MAGIC = b"GSPB"
+""" Magic bytes at the start of any binary command file """
+
+VERSION = 2
+""" Version of the binary format (version 1 files have no index) """
+
+ALIGNMENT = 64
+""" Alignment (in bytes) of payloads """
+
+CHECKPOINT = 1000
+""" Default number of commands between two checkpoints """
+
+INDEX = b"GSPX"
+""" Magic bytes at the start and end of the index """
+
+_file_header = struct.Struct("<4sI")
+_frame_header = struct.Struct("<IQ")
+_index_header = struct.Struct("<4sII")
+_index_footer = struct.Struct("<Q4s")
+
+
+def _align(offset):
+    """ Return the first aligned offset after the given one """
+
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _payload(value):
+    """ Return value as a flat unsigned byte array (no copy if possible) """
+
+    if isinstance(value, np.ndarray):
+        return np.ascontiguousarray(value).reshape(-1).view(np.ubyte)
+    value = memoryview(value)
+    if not value.c_contiguous:
+        value = memoryview(value.tobytes())
+    return np.frombuffer(value, np.ubyte)
+
+
+def dump_command(command, stream=sys.stdout.buffer, offset=0, digests=None):
+    """
+    Write a command frame to the given binary stream.
+
+    Parameters
+    ----------
+    command : Command
+        Command to write
+    stream :
+        Binary stream to write to
+    offset : int
+        Current offset of the stream relative to the start of the
+        file, used to align payloads.
+    digests : dict
+        Absolute offsets of the payloads already written, indexed by
+        digest. When given, identical payloads are written only once
+        and the dictionary is updated.
+
+    Returns
+    -------
+    Number of bytes written
+    """
+
+    payload = gsp_json.dump_command(command, stream=None)
+    return dump_payload(payload, stream, offset, digests)
+
+
+def dump_payload(payload, stream, offset=0, digests=None):
+    """
+    Write a command frame from its JSON payload (see
+    `gsp.io.json.dump_command`) and return the number of bytes
+    written. Parameters are the same as for `dump_command`.
+    """
+
+    parameters, buffers, payloads, positions = {}, {}, [], {}
+    size = 0
+    for key, value in payload["parameters"].items():
+        if isinstance(value, (np.ndarray, bytes, memoryview)):
+            data = _payload(value)
+            buffer = { "nbytes": data.nbytes,
+                       "type": type(value).__name__ }
+            if isinstance(value, np.ndarray):
+                buffer["dtype"] = convert(value.dtype, "str")
+                buffer["shape"] = list(value.shape)
+            digest = gsp_json.digest(data) if digests is not None else None
+            if digest is not None and digest in digests:
+                buffer["at"] = digests[digest]
+            elif digest is not None and digest in positions:
+                buffer["offset"] = positions[digest]
+            else:
+                buffer["offset"] = size
+                payloads.append(data)
+                positions[digest] = size
+                size = _align(size + data.nbytes)
+            buffers[key] = buffer
+            parameters[key] = None
+        else:
+            parameters[key] = value
+    payload = dict(payload, parameters=parameters)
+    if buffers:
+        payload["buffers"] = buffers
+
+    header = json.dumps(payload, separators=(",", ":"),
+                        default=gsp_json.default).encode()
+    stream.write(_frame_header.pack(len(header), size))
+    stream.write(header)
+    start = offset + _frame_header.size + len(header)
+    if not payloads:
+        return start - offset
+    stream.write(bytes(_align(start) - start))
+    for data in payloads:
+        stream.write(data)
+        stream.write(bytes(_align(data.nbytes) - data.nbytes))
+    if digests is not None:
+        for digest, position in positions.items():
+            digests[digest] = _align(start) + position
+    return _align(start) - offset + size
+
+
+class _State:
+    """
+    Frames needed to rebuild the state of the objects at the current
+    position of a command stream (see checkpoints).
+    """
+
+    def __init__(self):
+        self.frames = {}    # cid -> (offset, target id, referenced ids)
+        self.renders = {}   # target id -> (referenced ids, droppable cids)
+        self.rendered = set()
+        self.buffers = {}   # buffer id -> folded buffer description
+        self.deleted = set()
+
+    def push(self, payload, offset):
+        """ Account for the command frame written at offset """
+
+        method, cid = payload["method"], payload["id"]
+        parameters = payload["parameters"]
+        target = parameters["id"]
+        references = tuple(sorted(value for key, value in parameters.items()
+                                  if key.endswith("(id)")))
+        name = method.split("/")[-1] if "/" in method else None
+
+        if name == "delete":
+            self.deleted.add(target)
+            return
+        elif name == "set_data" and self._fold(target, payload):
+            return
+        elif name == "render":
+            self._render(target, references, cid, parameters)
+        elif name is None and method == "core.Buffer":
+            self.buffers[target] = { "payload": payload, "data": None,
+                                     "dirty": None, "fold": True, "ranges": [],
+                                     "written": 0, "based": parameters.get("data") is not None }
+        self.frames[cid] = offset, target, references
+
+    def _render(self, target, references, cid, parameters):
+        """
+        Drop the previous render of target if it is superseded by this
+        one (see `CommandQueue.compact` for the same rules).
+        """
+
+        previous, cids = self.renders.get(target, (None, []))
+        if previous != references:
+            cids = []
+        # Canvas render only produces an output while a visual render
+        # is superseded by a render with all the matrices (the first
+        # render of a visual on a viewport decides the drawing order)
+        if ("viewport(id)" not in parameters or
+            all(parameters.get(name) is not None for name in ("model", "view", "proj"))):
+            for previous in cids:
+                self.frames.pop(previous, None)
+            cids = []
+        if (target, references) in self.rendered:
+            cids.append(cid)
+        self.rendered.add((target, references))
+        self.renders[target] = references, cids
+
+    def _fold(self, target, payload):
+        """
+        Fold a buffer update into the buffer content and return whether
+        it has been folded.
+        """
+
+        buffer = self.buffers.get(target)
+        if buffer is None or not buffer["fold"]:
+            return False
+        try:
+            if buffer["data"] is None:
+                parameters = buffer["payload"]["parameters"]
+                nbytes = int(parameters["count"])*np.dtype(parameters["dtype"]).itemsize
+                buffer["data"] = np.zeros(nbytes, np.ubyte)
+                if parameters.get("data") is not None:
+                    data = _payload(parameters["data"])[:nbytes]
+                    buffer["data"][:data.nbytes] = data
+            offset = int(payload["parameters"]["offset"])
+            data = _payload(payload["parameters"]["data"])
+        except (TypeError, ValueError, KeyError):
+            data = None
+        if data is None or offset < 0 or offset + data.nbytes > len(buffer["data"]):
+            # Later updates cannot be folded without reordering
+            buffer["fold"] = False
+            return False
+        buffer["data"][offset:offset+data.nbytes] = data
+        buffer["payload"] = dict(buffer["payload"], timestamp=payload["timestamp"])
+        buffer["update"] = payload
+        start, end = buffer["dirty"] or (offset, offset+data.nbytes)
+        buffer["dirty"] = min(start, offset), max(end, offset+data.nbytes)
+        return True
+
+    def checkpoint(self, write):
+        """
+        Write folded buffers using the write function (that takes a
+        payload and returns the offset of the written frame) and return
+        the offsets of the frames of the checkpoint.
+        """
+
+        # Objects that have been deleted are dropped unless they are
+        # still referenced by a live object
+        dropped = set(self.deleted)
+        while True:
+            referenced = set()
+            for offset, target, references in self.frames.values():
+                if target not in dropped:
+                    referenced.update(references)
+            if not (dropped & referenced):
+                break
+            dropped -= referenced
+        if dropped:
+            self.frames = { cid: frame for cid, frame in self.frames.items()
+                            if frame[1] not in dropped }
+            self.renders = { key: render for key, render in self.renders.items()
+                             if key not in dropped }
+            self.rendered = set(key for key in self.rendered if key[0] not in dropped)
+            for target in dropped:
+                self.buffers.pop(target, None)
+            self.deleted -= dropped
+
+        ranges = {}
+        for target, buffer in self.buffers.items():
+            if buffer["dirty"]:
+                self._write(buffer, write)
+            ranges[buffer["payload"]["id"]] = buffer["ranges"]
+        offsets = []
+        for cid, (offset, target, references) in self.frames.items():
+            offsets.append(offset)
+            offsets.extend(ranges.get(cid, []))
+        return offsets
+
+    def _write(self, buffer, write):
+        """
+        Write the bytes of a buffer that changed since the last
+        checkpoint as a set_data frame replayed after the buffer frame.
+        The whole buffer is written instead once these frames would
+        hold more bytes than the buffer itself, such that checkpoints
+        cost at most twice the size of the buffer.
+        """
+
+        data = buffer["data"]
+        start, end = buffer["dirty"]
+        buffer["dirty"] = None
+        if buffer["based"] and buffer["written"] + end - start <= len(data):
+            payload = buffer["update"]
+            parameters = dict(payload["parameters"], offset=start,
+                              data=memoryview(data[start:end]))
+            buffer["ranges"].append(write(dict(payload, parameters=parameters)))
+            buffer["written"] += end - start
+            return
+        payload = buffer["payload"]
+        parameters = dict(payload["parameters"], data=memoryview(data))
+        offset = write(dict(payload, parameters=parameters))
+        _, target, references = self.frames[payload["id"]]
+        self.frames[payload["id"]] = offset, target, references
+        buffer["ranges"], buffer["written"], buffer["based"] = [], 0, True
+
+
+def dump(queue=None, filename=None, dedup=True, checkpoint=CHECKPOINT):
+    """
+    Save command queue to a file (or return it as bytes). If dedup
+    is True, identical payloads are only written once. A checkpoint
+    is written every checkpoint commands (none if 0 or None).
+    """
+
+    import io
+
+    queue = queue or CommandQueue("active")
+    if filename is None:
+        with io.BytesIO() as stream:
+            _dump(queue, stream, dedup, checkpoint)
+            return stream.getvalue()
+    else:
+        with open(filename, "wb") as stream:
+            _dump(queue, stream, dedup, checkpoint)
+
+
+def _dump(queue, stream, dedup=True, checkpoint=CHECKPOINT):
+    """ Write file header, command frames and index to stream """
+
+    stream.write(_file_header.pack(MAGIC, VERSION))
+    offset = _file_header.size
+    digests = {} if dedup else None
+    state = _State() if checkpoint else None
+
+    def write(payload):
+        nonlocal offset
+        start = offset
+        offset += dump_payload(payload, stream, offset, digests)
+        return start
+
+    cids, offsets, positions, starts, frames = [], [], [], [0], []
+    commands = queue.commands
+    for index, command in enumerate(commands):
+        payload = gsp_json.dump_command(command, stream=None)
+        cids.append(payload["id"])
+        offsets.append(write(payload))
+        if state is None:
+            continue
+        state.push(payload, offsets[-1])
+        if (index+1) % checkpoint == 0 and index+1 < len(commands):
+            frames.extend(state.checkpoint(write))
+            positions.append(index+1)
+            starts.append(len(frames))
+
+    stream.write(_index_header.pack(INDEX, len(cids), len(positions)))
+    for values in (cids, offsets, positions, starts, frames):
+        stream.write(struct.pack(f"<{len(values)}Q", *values))
+    size = (_index_header.size + _index_footer.size +
+            8*(len(cids) + len(offsets) + len(positions) + len(starts) + len(frames)))
+    stream.write(_index_footer.pack(size, INDEX))
+
+
+def save(filename, queue = None, dedup = True, checkpoint = CHECKPOINT):
+    """ Save command queue to a file """
+
+    queue = queue or CommandQueue("active")
+    dump(queue, filename, dedup, checkpoint)
+
+
+def _view(data, start, buffer):
+    """ Zero-copy view on a payload """
+
+    if "at" in buffer:
+        offset = buffer["at"]
+    else:
+        offset = start + buffer["offset"]
+    if buffer["type"] == "ndarray":
+        dtype = convert(buffer["dtype"], "dtype")
+        count = buffer["nbytes"] // dtype.itemsize
+        return np.frombuffer(data, dtype, count, offset).reshape(buffer["shape"])
+    view = np.frombuffer(data, np.ubyte, buffer["nbytes"], offset)
+    return memoryview(view)
+
+
+def frame_size(data, offset):
+    """
+    Return the size of the frame at offset, or None if data is too
+    short to hold the complete frame.
+    """
+
+    if offset + _frame_header.size > len(data):
+        return None
+    header_size, payload_size = _frame_header.unpack_from(data, offset)
+    end = offset + _frame_header.size + header_size
+    if payload_size:
+        end = _align(end) + payload_size
+    if end > len(data):
+        return None
+    return end - offset
+
+
+def load_frame(data, offset):
+    """
+    Read the command frame at the given offset of data (bytes-like,
+    usually a memory-mapped file).
+
+    Returns
+    -------
+    The command and the offset following the frame
+    """
+
+    header_size, payload_size = _frame_header.unpack_from(data, offset)
+    offset += _frame_header.size
+    command = json.loads(bytes(data[offset:offset+header_size]))
+    start = offset + header_size
+    if payload_size:
+        start = _align(start)
+
+    method = command["method"]
+    try:
+        classname, methodname = method.split("/")
+    except ValueError:
+        classname, methodname = method, "__init__"
+    parameters = command["parameters"]
+    for key, buffer in command.get("buffers", {}).items():
+        parameters[key] = _view(data, start, buffer)
+    command = Command(classname,  methodname, parameters,
+                      cid = command.get("id"),
+                      timestamp = command.get("timestamp"))
+    return command, start + payload_size
+
+
+def _map(filename):
+    """ Memory-map a file for reading """
+
+    with open(filename, "rb") as stream:
+        try:
+            return mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            return b""
+
+
+def index(data):
+    """
+    Read the index of a binary file (bytes-like).
+
+    Returns
+    -------
+    The command ids and offsets (as arrays) and the list of
+    checkpoints as (position, frame offsets) tuples.
+    """
+
+    version = _file_header.unpack_from(data, 0)[1]
+    if version < 2:
+        # No index, frames are scanned
+        cids, offsets, offset = [], [], _file_header.size
+        while offset < len(data):
+            header_size, _ = _frame_header.unpack_from(data, offset)
+            header = data[offset+_frame_header.size:offset+_frame_header.size+header_size]
+            cids.append(json.loads(bytes(header))["id"])
+            offsets.append(offset)
+            offset += frame_size(data, offset)
+        return np.array(cids, np.uint64), np.array(offsets, np.uint64), []
+
+    if len(data) < _file_header.size + _index_header.size + _index_footer.size:
+        raise ValueError("Missing index")
+    size, magic = _index_footer.unpack_from(data, len(data) - _index_footer.size)
+    start = len(data) - size
+    if magic != INDEX or start < _file_header.size:
+        raise ValueError("Missing index")
+    magic, count, checkpoints = _index_header.unpack_from(data, start)
+    if magic != INDEX:
+        raise ValueError("Corrupted index")
+
+    def array(count):
+        nonlocal start
+        values = np.frombuffer(data, "<u8", count, start)
+        start += 8*count
+        return values
+
+    start += _index_header.size
+    cids, offsets = array(count), array(count)
+    positions, starts = array(checkpoints), array(checkpoints+1)
+    frames = array(int(starts[-1]))
+    return cids, offsets, [(int(positions[i]), frames[starts[i]:starts[i+1]])
+                           for i in range(checkpoints)]
+
+
+def load(filename, queue = None, until = None):
+    """
+    Load commands from a binary file into the default command queue.
+    If until is given (command id), the state after this command is
+    loaded instead, starting from the nearest checkpoint.
+    """
+
+    data = _map(filename)
+    if len(data) < _file_header.size:
+        raise ValueError(f"{filename} is not a GSP binary file")
+    magic, version = _file_header.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{filename} is not a GSP binary file")
+    if version > VERSION:
+        raise ValueError(f"Unsupported GSP binary version ({version})")
+
+    # Get default command queue
+    queue = queue or CommandQueue("active")
+    queue.empty()
+
+    cids, offsets, checkpoints = index(data)
+    frames = offsets
+    if until is not None:
+        position = np.flatnonzero(cids == until)
+        if not len(position):
+            raise ValueError(f"Unknown command ({until})")
+        position = int(position[0]) + 1
+        frames = offsets[:position]
+        i = bisect.bisect_right([p for p, _ in checkpoints], position)
+        if i > 0:
+            start, checkpoint = checkpoints[i-1]
+            frames = list(checkpoint) + list(offsets[start:position])
+
+    for offset in frames:
+        command, _ = load_frame(data, int(offset))
+        queue.push(command)
+
+    return queue
@@ -0,0 +1,101 @@
+# Package: Graphic Server Protocol
+# Authors: Nicolas P .Rougier <nicolas.rougier@gmail.com>
+# License: BSD 3 clause
+"""
+Compression codecs for buffers saved in command files. Codecs only
+rely on the standard library (zlib, lzma) and can be combined with a
+byte-shuffle filter that groups bytes of the same significance
+together, which helps compressing float arrays.
+"""
+import zlib
+import lzma
+import numpy as np
+
+codecs = { "zlib" : (zlib.compress, zlib.decompress),
+           "lzma" : (lzma.compress, lzma.decompress) }
+""" Available codecs as (compress, decompress) functions """
+
+THRESHOLD = 1024
+""" Size (in bytes) under which buffers are not automatically compressed """
+
+RATIO = 1.2
+""" Minimal compression ratio for a codec to be automatically chosen """
+
+SAMPLE = 2**16
+""" Size (in bytes) of the sample used to measure compression ratio """
+
+
+def shuffle(data, itemsize):
+    """ Group together bytes of the same significance of items """
+
+    data = np.frombuffer(data, np.ubyte)
+    return data.reshape(-1, itemsize).T.tobytes()
+
+
+def unshuffle(data, itemsize):
+    """ Reverse the shuffle filter """
+
+    data = np.frombuffer(data, np.ubyte)
+    return data.reshape(itemsize, -1).T.tobytes()
+
+
+def encode(data, codec, itemsize = 0):
+    """
+    Compress data using the given codec.
+
+    Parameters
+    ----------
+    data:
+        Data to compress (bytes-like)
+    codec:
+        Name of the codec ("zlib" or "lzma")
+    itemsize:
+        Item size to use for the shuffle filter (0 means no shuffle)
+    """
+
+    if codec not in codecs:
+        raise ValueError(f"Unknown codec ({codec})")
+    if itemsize > 1:
+        data = shuffle(data, itemsize)
+    return codecs[codec][0](data)
+
+
+def decode(data, codec, itemsize = 0):
+    """ Decompress data that has been compressed with `encode` """
+
+    if codec not in codecs:
+        raise ValueError(f"Unknown codec ({codec})")
+    data = codecs[codec][1](data)
+    if itemsize > 1:
+        data = unshuffle(data, itemsize)
+    return data
+
+
+def choose(data, itemsize = 0, threshold = THRESHOLD, ratio = RATIO):
+    """
+    Choose a codec for data based on its size and on the compression
+    ratio measured on a sample. Return None when data is too small or
+    does not compress well enough.
+    """
+
+    data = np.frombuffer(data, np.ubyte)
+    if data.nbytes < threshold:
+        return None
+
+    # Sample is made of whole items such that it can be shuffled
+    size = min(data.nbytes, SAMPLE)
+    if itemsize > 1:
+        size -= size % itemsize
+    sample = data[:size].tobytes()
+    if itemsize > 1:
+        sample = shuffle(sample, itemsize)
+
+    ratios = { codec : len(sample) / max(1, len(compress(sample)))
+               for codec, (compress, decompress) in codecs.items() }
+
+    # lzma is slower to decompress and needs to be significantly better
+    if ratios["lzma"] >= max(ratio, 1.1*ratios["zlib"]):
+        return "lzma"
+    elif ratios["zlib"] >= ratio:
+        return "zlib"
+    return None
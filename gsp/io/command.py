@@ -10,15 +10,18 @@ import sys
 import types
 import typing
 import inspect
+import weakref
+import functools
 import itertools
+import concurrent.futures
 from datetime import datetime
 from functools import wraps
 from types import UnionType
 from typing import Union, get_origin, get_args
 
 from gsp.log import log
-from gsp.object import Object, OID
-from . convert import Converter, get_converter, register
+from gsp.object import Object, OID, Namespace
+from . convert import Converter, get_converter, register, generation
 
 
 __record__ = True
@@ -43,8 +46,9 @@ def record(state : bool = False):
 def queue(name = "default"):
     """
     Return a new or existing command queue. There is a special
-    name "active" that relates to the current command queue. Each time
-    a queue is created, it becomes automatically the active one.
+    name "active" that relates to the current command queue (the one
+    of the active namespace if any). Each time a queue is created, it
+    becomes automatically the active one.
     """
 
     return CommandQueue(name)
@@ -61,6 +65,15 @@ class NamedSingleton(type):
 
     def __call__(cls, name="default", *args, **kwargs):
         if name == "active" or name is None:
+            namespace = Namespace.current()
+            if namespace is not None:
+                # The queue of a namespace does not become the
+                # process wide active one
+                if namespace.queue is None:
+                    active = CommandQueue.active
+                    namespace.queue = super(NamedSingleton, cls).__call__("namespace", *args, **kwargs)
+                    CommandQueue.active = active
+                return namespace.queue
             if CommandQueue.active is None:
                 CommandQueue.active = super(NamedSingleton, cls).__call__("default", *args, **kwargs)
             return CommandQueue.active
@@ -80,6 +93,9 @@ class CommandQueue(metaclass = NamedSingleton):
     commands = None
     active = None
 
+    # Bounds (count, nbytes) of a bounded queue (see `bound`)
+    _bounds = None
+
     def __init__(self, name : str = "active"):
         """
         Parameters
@@ -114,9 +130,156 @@ class CommandQueue(metaclass = NamedSingleton):
         """ Empty the queue """
 
         self.commands = []
+        if self._bounds is not None:
+            self._nbytes = 0
+            self._compacted = 0, 0
+        return self
+
+
+    def bound(self, count = None, nbytes = None, journal = None):
+        """
+        Bound the number of commands and/or the size of their buffers
+        kept in memory. When a bound is exceeded, the oldest commands
+        are either appended to the journal (if given, see
+        `gsp.io.journal`) and removed from memory or folded into the
+        current state by compacting the queue (see `compact`) and, if
+        this is not enough, by folding buffer updates into buffer
+        snapshots. In both cases, the whole session can still be
+        replayed (see `session`).
+
+        Parameters
+        ----------
+
+        count : int
+
+            Maximum number of commands to keep in memory
+
+        nbytes : int
+
+            Maximum size (in bytes) of the buffers of the commands kept
+            in memory
+
+        journal : str
+
+            Name of the journal file where to spill old commands
+
+        Returns
+        -------
+
+        The bounded queue
+        """
+
+        from . journal import Journal
+
+        if getattr(self, "_journal", None) is not None:
+            self._journal.close(flush=False)
+        self._journal = None
+        if journal is not None:
+            self._journal = Journal(journal, self, sync=False)
+        self._bounds = None
+        if count is not None or nbytes is not None:
+            self._bounds = count, nbytes
+        self._nbytes = sum(_command_nbytes(command) for command in self.commands)
+        self._compacted = 0, 0
         return self
 
 
+    def session(self):
+        """
+        Return all the commands of the session, including the ones that
+        have been spilled to the journal of a bounded queue.
+        """
+
+        if getattr(self, "_journal", None) is None:
+            return self.commands
+
+        from . journal import iterload
+
+        def session(commands):
+            yield from iterload(self._journal.filename)
+            yield from commands
+        return session(list(self.commands))
+
+
+    def _evict(self):
+        """ Evict old commands if the queue bounds are exceeded """
+
+        count, nbytes = self._bounds
+        commands = self.commands
+        if self._journal is None:
+            # Compaction is only tried again when the queue has doubled
+            # since the last compaction (that may not have been enough)
+            count = max(count or 0, 2*self._compacted[0]) or None
+            nbytes = max(nbytes or 0, 2*self._compacted[1]) or None
+        if ((count is None or len(commands) <= count) and
+            (nbytes is None or self._nbytes <= nbytes)):
+            return
+
+        if self._journal is None:
+            self.compact()
+            count, nbytes = self._bounds
+            if ((count is not None and len(self.commands) > count) or
+                (nbytes is not None and self._nbytes > nbytes)):
+                self._fold()
+            self._compacted = len(self.commands), self._nbytes
+            return
+
+        # Oldest commands are spilled down to 3/4 of the bounds such
+        # that the journal is appended by batches
+        index, size = 0, self._nbytes
+        while index < len(commands) and (
+              (count is not None and len(commands) - index > 3*count//4) or
+              (nbytes is not None and size > 3*nbytes//4)):
+            size -= _command_nbytes(commands[index])
+            index += 1
+        # Conversions made while dumping must not be recorded
+        readonly, self.readonly = self.readonly, True
+        try:
+            self._journal.append(commands[:index])
+        finally:
+            self.readonly = readonly
+        del commands[:index]
+        self._nbytes = size
+
+
+    def _fold(self):
+        """
+        Fold buffer updates (set_data) into the data of the buffer
+        creation command, i.e. a snapshot of the buffer (see
+        `gsp.io.binary._State`). Renders in between updates then
+        replay with the final content of buffers.
+        """
+
+        from . binary import _State
+
+        state = _State()
+        commands = []
+        for command in self.commands:
+            parameters = { key : value.value if isinstance(value, Converter) else value
+                           for key, value in command.parameters.items() }
+            payload = { "parameters" : parameters, "timestamp" : command.timestamp }
+            target = parameters["id"]
+            if command.methodname == "core.Buffer":
+                state.buffers[target] = { "payload" : payload, "data" : None,
+                                          "dirty" : None, "fold" : True,
+                                          "index" : len(commands) }
+            elif command.methodname == "set_data" and state._fold(target, payload):
+                continue
+            commands.append(command)
+
+        # Commands may be shared (e.g. with a saved queue) and are thus
+        # replaced rather than modified
+        for buffer in state.buffers.values():
+            if buffer["dirty"]:
+                command = commands[buffer["index"]]
+                commands[buffer["index"]] = _replace(
+                    command, command.parameters | { "data" : memoryview(buffer["data"]) })
+        log.info("Folded queue from %d to %d command(s)",
+                 len(self.commands), len(commands))
+        self.commands = commands
+        self._nbytes = sum(_command_nbytes(command) for command in commands)
+
+
     def __len__(self):
         """ Length of command queue. """
 
@@ -129,29 +292,92 @@ class CommandQueue(metaclass = NamedSingleton):
         return self.commands[index]
 
 
-    def run(self, backend_module: types.ModuleType):
+    def run(self, backend_module: types.ModuleType, commands = None,
+                  profiler = None, namespace = None):
         """
-        Execute all commands in the queue, with the provided
-        globals and locals dictionary that must contain claases and
-        methids from all the commands.
+        Execute all commands in the queue using the provided backend
+        module that must contain classes from all the commands.
 
         Parameters
         ----------
 
-        globals : dict
+        backend_module : module
+
+            Module where to find the classes referenced by commands
+
+        commands : iterable
+
+            Commands to execute in place of the queue ones (default
+            to the whole session, see `session`). This can be an
+            iterator (e.g. `gsp.io.json.iterload(filename)`) such that
+            commands are executed as soon as they are available.
+
+        profiler : Profiler
 
-            Dictionary containing the current scope's global variables
+            Profiler recording the execution of each command (see
+            `gsp.io.profile`)
 
-        locals : dict
+        namespace : Namespace
 
-            Dictionary containing the current scope's local variables
+            Namespace where to create and resolve objects (default to
+            the active one, see `gsp.object.Namespace`)
         """
 
+        if commands is None:
+            commands = self.session()
         readonly = self.readonly
         self.readonly = True
-        for command in self.commands:
-            command.execute(backend_module)
-        self.readonly = readonly
+        try:
+            Dispatcher(backend_module).run(commands, profiler, namespace)
+        finally:
+            self.readonly = readonly
+
+
+    def fanout(self, backend_modules, commands = None):
+        """
+        Execute all commands in the queue concurrently with several
+        backend modules. Each backend runs in its own thread with its
+        own namespace (see `gsp.object.Namespace`) such that the
+        total latency is the one of the slowest backend (as long as
+        backends release the GIL, e.g. when rendering or writing).
+
+        Parameters
+        ----------
+
+        backend_modules : list of modules
+
+            Modules where to find the classes referenced by commands
+
+        commands : iterable
+
+            Commands to execute in place of the queue ones (default
+            to the whole session, see `session`)
+
+        Returns
+        -------
+
+        The registries of objects of the backends (in the same order)
+        """
+
+        if commands is None:
+            commands = self.session()
+        commands = list(commands)
+        weak = not isinstance(Object.objects, dict)
+
+        def run(backend_module):
+            namespace = Namespace(weak=weak)
+            Dispatcher(backend_module).run(commands, namespace=namespace)
+            return namespace.objects
+
+        readonly = self.readonly
+        self.readonly = True
+        try:
+            with concurrent.futures.ThreadPoolExecutor(len(backend_modules)) as executor:
+                futures = [executor.submit(run, backend_module)
+                           for backend_module in backend_modules]
+            return [future.result() for future in futures]
+        finally:
+            self.readonly = readonly
 
 
     def push(self, command):
@@ -174,10 +400,145 @@ class CommandQueue(metaclass = NamedSingleton):
 
         if not self.readonly:
             self.commands.append(command)
+            if self._bounds is not None:
+                self._nbytes += _command_nbytes(command)
+                self._evict()
             return True
         return False
 
 
+    def compact(self):
+        """
+        Remove commands whose effect is fully superseded by later
+        commands such that replaying the compacted queue gives the
+        same final state:
+
+        - a `set_*` command (but `set_data`) is superseded by a later
+          call of the same method on the same object,
+        - a `set_data` command is superseded by later `set_data`
+          commands on the same object that overwrite its whole range,
+        - a visual `render` command is superseded by later renders of
+          the same visual on the same viewport. The first one is kept
+          since it decides the drawing order, the last one is kept with
+          the model, view and proj matrices that were active.
+
+        A command is never considered superseded across a kept render
+        command or across a command using the object (e.g. as a
+        parameter) since these may observe the intermediate state.
+
+        Returns
+        -------
+
+        The compacted queue
+        """
+
+        # Find renders to keep (first and last per visual and viewport)
+        renders = {}
+        for index, command in enumerate(self.commands):
+            if (command.methodname == "render" and
+                "viewport(id)" in command.parameters.keys()):
+                key = command.parameters["id"], command.parameters["viewport(id)"]
+                renders.setdefault(key, [index, index])[1] = index
+        kept = set(index for first, last in renders.values()
+                         for index in (first, last))
+
+        # Kept renders use the matrices that were active at that time
+        # since a render without matrices reuses the previous ones.
+        # Commands may be shared and are thus replaced, not modified.
+        queue = list(self.commands)
+        matrices = {}
+        for index, command in enumerate(queue):
+            if (command.methodname == "render" and
+                "viewport(id)" in command.parameters.keys()):
+                active = matrices.setdefault(command.parameters["id"], {})
+                for name in ("model", "view", "proj"):
+                    if command.parameters.get(name) is not None:
+                        active[name] = command.parameters[name]
+                if index in kept and active:
+                    queue[index] = _replace(command, command.parameters | active)
+
+        # Find superseded commands (backward)
+        commands = []
+        setters, ranges = {}, {}
+        for index in range(len(queue)-1, -1, -1):
+            command = queue[index]
+            methodname = command.methodname
+            oid = command.parameters["id"]
+
+            if methodname == "render":
+                if "viewport(id)" in command.parameters.keys() and index not in kept:
+                    continue
+                setters, ranges = {}, {}
+            elif methodname == "set_data":
+                start = command.parameters.get("offset")
+                nbytes = _nbytes(command.parameters.get("data"))
+                if start is not None and nbytes is not None:
+                    stop = start + nbytes
+                    intervals = ranges.get(oid, [])
+                    if any(a <= start and stop <= b for a, b in intervals):
+                        continue
+                    ranges[oid] = _merge(intervals, start, stop)
+            elif methodname.startswith("set_"):
+                if methodname in setters.setdefault(oid, set()):
+                    continue
+                setters[oid].add(methodname)
+
+            # Objects used by this command may be observed here
+            for key, value in command.parameters.items():
+                if key.endswith("(id)"):
+                    setters.pop(value, None)
+                    ranges.pop(value, None)
+            commands.append(command)
+
+        commands.reverse()
+        log.info("Compacted queue from %d to %d command(s)",
+                 len(self.commands), len(commands))
+        self.commands = commands
+        if self._bounds is not None:
+            self._nbytes = sum(_command_nbytes(command) for command in commands)
+        return self
+
+
+def _replace(command, parameters):
+    """ Copy of command (same id and timestamp) with new parameters. """
+
+    return Command(command.classname, command.methodname, parameters,
+                   command.annotations, cid = command.id,
+                   timestamp = command.timestamp)
+
+
+def _nbytes(data):
+    """ Size in bytes of data or None if unknown. """
+
+    if isinstance(data, (bytes, bytearray)):
+        return len(data)
+    return getattr(data, "nbytes", None)
+
+
+def _command_nbytes(command):
+    """ Size in bytes of the buffers of a command. """
+
+    size = 0
+    for value in command.parameters.values():
+        if isinstance(value, Converter):
+            value = value.value
+        size += _nbytes(value) or 0
+    return size
+
+
+def _merge(intervals, start, stop):
+    """ Merge interval [start, stop[ into a list of disjoint intervals. """
+
+    merged = []
+    for a, b in intervals:
+        if b < start or a > stop:
+            merged.append((a, b))
+        else:
+            start, stop = min(a, start), max(b, stop)
+    merged.append((start, stop))
+    return merged
+
+
 def get_default_args(func):
     """Retrieve default arguments and their values from a function. """
 
@@ -188,6 +549,150 @@ def get_default_args(func):
         if v.default is not inspect.Parameter.empty }
 
 
+class CallPlan:
+    """
+    A call plan gathers everything the command decorator needs to
+    know about a decorated method (parameter names, default values,
+    annotated types and resolved converters) such that this
+    introspection is done once and not on every call.
+
+    Parameter names and defaults are computed when the plan is
+    created. Type hints are resolved on first use because they may
+    refer to a class that is not yet defined at decoration time (e.g.
+    `Transform.set_base(self, base : Transform)`). Converters are
+    resolved once per (parameter, source type) and discarded as soon
+    as the converters registry changes.
+    """
+
+    def __init__(self, func, name=None):
+        """
+        Parameters
+        ----------
+        func:
+            Decorated method
+        name:
+            Method name to record (defaults to the function name)
+        """
+
+        code = func.__code__
+        self.func = func
+        self.keys = code.co_varnames[1:code.co_argcount]
+        self.defaults = get_default_args(func)
+        self.methodname = code.co_name if name is None else name
+        self._annotations = None
+        self._types = None
+        self._resolved = {}
+        self._generation = None
+
+    @property
+    def annotations(self):
+        """ Resolved type hints of the method """
+
+        if self._annotations is None:
+            self._annotations = typing.get_type_hints(self.func)
+        return self._annotations
+
+    @property
+    def types(self):
+        """ Annotated types (union members) per parameter """
+
+        if self._types is None:
+            self._types = {}
+            for key, annotation in self.annotations.items():
+                if get_origin(annotation) is UnionType:
+                    self._types[key] = get_args(annotation)
+                else:
+                    self._types[key] = annotation,
+        return self._types
+
+    def bind(self, object, args, kwargs):
+        """
+        Bind positional, named and default arguments to parameter
+        names. Parameters holding an Object are renamed with an
+        `(id)` suffix to indicate they need to be resolved when
+        the command is executed.
+        """
+
+        parameters = {"id": object.id}
+        for key, value in zip(self.keys, args):
+            if isinstance(value, Object):
+                key = key + "(id)"
+            parameters[key] = value
+
+        bound = self.keys[:len(args)]
+        for key, value in kwargs.items():
+            if key not in bound:
+                if isinstance(value, Object):
+                    key = key + "(id)"
+                parameters[key] = value
+
+        for key, value in self.defaults.items():
+            if key not in bound and key not in kwargs:
+                if isinstance(value, Object):
+                    key = key + "(id)"
+                parameters[key] = value
+
+        return parameters
+
+    def check(self, parameters):
+        """
+        Check that parameters have the right type, else replace them
+        with a delayed conversion (Converter).
+        """
+
+        if self._generation != generation():
+            self._resolved = {}
+            self._generation = generation()
+
+        types = self.types
+        for key, value in parameters.items():
+            if key not in types:
+                continue
+            try:
+                converter = self._resolved[(key, value.__class__)]
+            except KeyError:
+                converter = self.resolve(key, value.__class__)
+                self._resolved[(key, value.__class__)] = converter
+            if converter is not None:
+                parameters[key] = Converter(converter, value)
+
+    def resolve(self, key, value_type):
+        """
+        Resolve the converter to use for a value of type `value_type`
+        given for parameter `key`. Return None when no conversion is
+        needed and raise a ValueError when no converter can be found.
+        """
+
+        check = False
+        converter = None
+        parameter_type = value_type
+        if "[" in parameter_type.__name__:
+            parameter_type = value_type.__base__
+        annotated_types = self.types[key]
+
+        for annotated_type in annotated_types:
+            # Parameter is an instance of one the annotated type
+            if (annotated_type == parameter_type or
+                isinstance(parameter_type,annotated_type) or
+                issubclass(parameter_type,annotated_type)):
+                check = True
+                break
+            elif parameter_type == types.NoneType:
+                check = True
+                break
+
+            # Search for a converter along the parameter type MRO
+            found = get_converter(value_type, annotated_type)
+            if found:
+                check = True
+                converter = found
+
+        if not check:
+            raise ValueError(
+                "No converter found for converting '%s' (%s) to %s."
+                % (key, parameter_type, list(annotated_types)))
+        return converter
+
 
 def command(name=None):
     """
@@ -198,9 +703,10 @@ def command(name=None):
 
     def wrapper(func):
 
+        plan = CallPlan(func, name)
+
         @wraps(func)
         def inner(self, *args, **kwargs):
-            global __record__
 
             no_command = False
             if "__no_command__" in kwargs:
@@ -213,94 +719,22 @@ def command(name=None):
                 return result
 
             queue = CommandQueue("active")
-            keys = func.__code__.co_varnames[1:]
-            annotations = func.__annotations__
-            annotations = typing.get_type_hints(func)
-
-            values = args
-            defaults = get_default_args(func)
-
-            # Add self (identifying by id) to parameters
-            parameters = {"id": self.id}
-
-            # Parameters
-            for key,value in zip(keys,values):
-                # We change the name of the parameter to indicate it is an ID
-                # This will be used later whne executing a command queue
-                if isinstance(value, Object):
-                    key = key + "(id)"
-                parameters[key] = value
-
-            # Named parameters
-            for key,value in zip(kwargs.keys(), kwargs.values()):
-                if key not in parameters.keys():
-                    if isinstance(value, Object):
-                        key = key + "(id)"
-                    parameters[key] = value
-
-            # Default parameters
-            for key,value in defaults.items():
-                if key not in parameters.keys():
-                    if isinstance(value, Object):
-                        key = key + "(id)"
-                    parameters[key] = value
+            parameters = plan.bind(self, args, kwargs)
 
             # Check if parameter is of the right type, else, search
             # for a conversion method inside the parameter class.
-            for key,value in parameters.items():
-                if key in annotations.keys():
-
-                    check = False
-                    parameter_type = parameters[key].__class__
-                    if "[" in parameter_type.__name__:
-                        parameter_type = parameters[key].__class__.__base__
-
-                    if get_origin(annotations[key]) is UnionType:
-                        annotated_types = list(get_args(annotations[key]))
-                    else:
-                        annotated_types = annotations[key],
-
-                    base_types = inspect.getmro(value.__class__)
-
-                    for annotated_type in annotated_types:
-                        # Parameter is an instance of one the annotated type
-                        if (annotated_type == parameter_type or
-                            isinstance(parameter_type,annotated_type) or
-                            issubclass(parameter_type,annotated_type)):
-                            check = True
-                            break
-                        elif parameter_type == types.NoneType:
-                            check = True
-                            break
-
-                        # Search for possible converters in any base type
-                        for base_type in base_types:
-                            # Found converter, register it
-                            converter = get_converter(base_type, annotated_type)
-                            if converter:
-                                check = True
-                                # if queue._immediate:
-                                # Immediate conversion
-                                # parameters[key] = converter(value)
-                                # else:
-                                # Delayed conversion
-                                parameters[key] = Converter(converter, value)
-
-                    if check:
-                        continue
-                    else:
-                        raise ValueError(
-                            "No converter found for converting '%s' (%s) to %s."
-                            % (key, parameter_type, annotated_types))
+            plan.check(parameters)
 
             if not no_command and not queue.readonly:
                 classname = self.__class__.__name__
-                methodname = func.__code__.co_name if name is None else name
-                command = Command(classname, methodname, parameters, annotations)
+                command = Command(classname, plan.methodname,
+                                  parameters, plan.annotations)
                 queue.push(command)
-                log.info("%s" % command)
+                log.info("%s", command)
 
             return result
+
+        inner.__plan__ = plan
         return inner
     return wrapper
 
@@ -328,7 +762,8 @@ class CID(int):
 class Command:
     """ Generic command with a unique id. """
 
-    def __init__(self,  classname,  methodname, parameters, annotations = None):
+    def __init__(self,  classname,  methodname, parameters, annotations = None,
+                 cid = None, timestamp = None):
         """ Build a new command with a unique command id (cid)
 
         Parameters
@@ -341,6 +776,10 @@ class Command:
             Dictionnary of parameters
         annotations : dict
             Annoated type of the called method
+        cid : int
+            Command id (a new one is created if None)
+        timestamp : float
+            Command timestamp (now if None)
 
         Examples
         --------
@@ -355,8 +794,10 @@ class Command:
         ```
         """
 
-        self.id = CID()
-        self.timestamp = datetime.timestamp(datetime.now())
+        self.id = CID(cid)
+        if timestamp is None:
+            timestamp = datetime.timestamp(datetime.now())
+        self.timestamp = timestamp
         if "id" not in parameters.keys():
             raise ValueError("Parameters needs to have an id")
         self.classname = classname
@@ -406,50 +847,176 @@ class Command:
                       % (key, type(value).__name__))
 
 
-    def execute(self, backend_module: types.ModuleType):
-        """ Execute the command. """
+    def execute(self, backend_module: types.ModuleType, profiler = None):
+        """
+        Execute the command, recording its execution with profiler if
+        given (see `gsp.io.profile`).
+        """
 
-        parameters = self.parameters.copy()
-        oid = parameters["id"]
-        del parameters["id"]
+        try:
+            dispatcher = _dispatchers[backend_module]
+        except KeyError:
+            dispatcher = _dispatchers[backend_module] = Dispatcher(backend_module)
+        if profiler is not None:
+            return profiler.execute(dispatcher.execute, self)
+        return dispatcher.execute(self)
 
-        # Resolve objects references
-        _parameters = {}
-        for key, value in parameters.items():
-            if key.endswith("(id)"):
-                _parameters[key[:-4]] = Object.objects[value]
-            elif isinstance(value, OID):
-                parameters[key] = Object.objects[value]
-            elif isinstance(value, Converter):
-                _parameters[key] = value()
-            else:
-                _parameters[key] = value
-        parameters = _parameters
-
-        # for key, value in parameters.items():
-        #     if isinstance(value, OID):
-        #         parameters[key] = Object.objects[value]
-        #     elif isinstance(value, Converter):
-        #         parameters[key] = value()
-
-        if "." in self.methodname:
-            module, name = self.methodname.split(".")
-            if len(module) > 0:
-                func = getattr(globals[module], name)
-            else:
-                func = eval(name, globals, locals)
-            object = func(**parameters)
-            object.id = oid
-            Object.objects[oid] = object
-            return object
-        elif self.methodname == "__init__":
-            source = f"backend_module.{self.classname}"
-            func = eval(source, None, {'backend_module': backend_module})
-            object = func(**parameters)
-            object.id = oid
-            Object.objects[oid] = object
-            return object
+
+class Dispatcher:
+    """
+    A dispatcher executes commands using a given backend module. The
+    callable corresponding to a (classname, methodname) and the object
+    references of a given parameter layout are resolved once and
+    cached for subsequent commands.
+    """
+
+    def __init__(self, backend_module: types.ModuleType):
+        """
+        Build a new dispatcher for the given backend.
+
+        Parameters
+        ----------
+        backend_module : module
+            Module where to find the classes referenced by commands
+        """
+
+        self.backend_module = backend_module
+        self._callables = {}
+        self._methods = {}
+        self._plans = {}
+
+    def resolve(self, classname, methodname):
+        """
+        Return the callable creating an object for the given
+        (classname, methodname) or None if this is a regular method.
+        """
+
+        key = classname, methodname
+        try:
+            return self._callables[key]
+        except KeyError:
+            pass
+
+        if "." in methodname:
+            path = methodname
+        elif methodname == "__init__":
+            path = classname
         else:
-            name = self.methodname
-            func = getattr(Object.objects[oid].__class__, name)
-            return func(Object.objects[oid], **parameters)
+            self._callables[key] = None
+            return None
+
+        func = self.backend_module
+        for name in path.split("."):
+            if name:
+                func = getattr(func, name)
+        self._callables[key] = func
+        return func
+
+    def method(self, cls, methodname):
+        """ Return the method `methodname` of class `cls` """
+
+        key = cls, methodname
+        try:
+            return self._methods[key]
+        except KeyError:
+            func = self._methods[key] = getattr(cls, methodname)
+            return func
+
+    def plan(self, classname, methodname, keys):
+        """
+        Return the execution plan of commands with given classname,
+        methodname and parameter keys, that is a tuple made of the
+        callable (see `resolve`), the (key, name) of object references
+        and the keys of other parameters (but the id).
+        """
+
+        key = classname, methodname, keys
+        try:
+            return self._plans[key]
+        except KeyError:
+            pass
+
+        references = tuple((key, key[:-4]) for key in keys
+                           if key.endswith("(id)"))
+        values = tuple(key for key in keys
+                       if key != "id" and not key.endswith("(id)"))
+        plan = self.resolve(classname, methodname), references, values
+        self._plans[classname, methodname, keys] = plan
+        return plan
+
+    def execute(self, command):
+        """ Execute a single command and return its result """
+
+        objects = Object.objects
+        parameters = command.parameters
+        func, references, values = self.plan(
+            command.classname, command.methodname, tuple(parameters))
+
+        kwargs = {key: parameters[key] for key in values}
+        for key, value in kwargs.items():
+            if value.__class__ in _deferred:
+                kwargs[key] = objects[value] if isinstance(value, OID) else value()
+        for key, name in references:
+            kwargs[name] = objects[parameters[key]]
+
+        oid = parameters["id"]
+        if func is None:
+            object = objects[oid]
+            try:
+                method = self._methods[object.__class__, command.methodname]
+            except KeyError:
+                method = self.method(object.__class__, command.methodname)
+            return method(object, **kwargs)
+        object = func(**kwargs)
+        object.id = oid
+        objects[oid] = object
+        return object
+
+    def run(self, commands, profiler = None, namespace = None):
+        """
+        Execute all the given commands in order, recording their
+        execution with profiler if given (see `gsp.io.profile`), inside
+        namespace if given (see `gsp.object.Namespace`)
+        """
+
+        if namespace is not None:
+            with namespace:
+                return self.run(commands, profiler)
+
+        # Replayed commands are not recorded again
+        queue = CommandQueue("active")
+        readonly, queue.readonly = queue.readonly, True
+        try:
+            self._run(commands, profiler)
+        finally:
+            queue.readonly = readonly
+
+    def _run(self, commands, profiler):
+        """ Execute all the given commands in order (see `run`) """
+
+        execute = self.execute
+        if profiler is not None:
+            execute = functools.partial(profiler.execute, self.execute)
+        if isinstance(Object.objects, dict):
+            for command in commands:
+                execute(command)
+            return
+
+        # With a weak registry, created objects are only referenced by
+        # the registry and are hence pinned until they are deleted.
+        for command in commands:
+            object = execute(command)
+            if (isinstance(object, Object) and
+                Object.objects.get(command.parameters["id"]) is object):
+                Object.objects.pin(object)
+
+
+_deferred = {OID, Converter}
+""" Parameter value types that need to be resolved at execution time """
+
+_dispatchers = weakref.WeakKeyDictionary()
+""" Dispatchers used by Command.execute, indexed by backend module """
+
+# Object deletion is a protocol command but the command decorator
+# cannot be imported from gsp.object (circular import)
+Object.delete = command()(Object.delete)
@@ -6,6 +6,12 @@ import numpy as np
 converters = {}
 """ Registered converters with keys equal to (src_type, dst_type) """
 
+__generation__ = 0
+""" Generation of the converters registry, incremented on each change """
+
+_dispatch = {}
+""" Resolved converters with keys equal to (src type, dst_type name) """
+
 class Converter:
     """
     This class is used to postpone the conversion of a parameter of
@@ -27,12 +33,31 @@ class Converter:
         return self.converter(self.value)
 
 
+def generation():
+    """
+    Return the current generation of the converters registry. Any
+    cached converter resolution made with an older generation is
+    stale and must be discarded.
+    """
+
+    return __generation__
+
+
+def _invalidate():
+    """ Signal a change in the converters registry. """
+
+    global __generation__
+    __generation__ += 1
+    _dispatch.clear()
+
+
 def unregister(src_types : str | tuple[str,...],
                dst_type : str):
     """
     Unregister converters from `src_types` to `dst_type`.
     """
 
+    _invalidate()
     if isinstance(src_types,(list,tuple)):
         for src_type in src_types:
             if (src_type,dst_type) in converters.keys():
@@ -51,6 +76,7 @@ def register(src_types : str | tuple[str,...],
     """
 
     def inner(func):
+        _invalidate()
         if isinstance(src_types,(list,tuple)):
             for src_type in src_types:
                 if (src_type,dst_type) not in converters.keys():
@@ -83,7 +109,9 @@ def is_registered(src_type, dst_type):
 def get_converter(value : object,
                   dst_type : str):
     """
-    Get a converter to convert value to dst_type.
+    Get a converter to convert value to dst_type. Converters are
+    searched along the full method resolution order of the source
+    type and the result is memoized until the registry changes.
 
     Parameters
     ----------
@@ -97,35 +125,38 @@ def get_converter(value : object,
     A convert function or None
     """
 
-    # Get source type
-    src_type = None
-    if isinstance(value, type):
-        src_type = value.__name__
-    else:
-        if isinstance(value, str) and is_registered(value, dst_type):
-            src_type = value
-        else:
-            src_type = type(value).__name__
-
     # Get dst type
     if isinstance(dst_type, type):
         dst_type = dst_type.__name__
     elif not isinstance(dst_type, str):
         raise ValueError("dst_type must be a type or a string")
 
+    # Get source type (a string is considered as a type name if it
+    # has been registered as such)
+    if isinstance(value, type):
+        src_type = value
+    elif isinstance(value, str) and is_registered(value, dst_type):
+        return is_registered(value, dst_type)
+    else:
+        src_type = type(value)
+
+    try:
+        return _dispatch[(src_type, dst_type)]
+    except KeyError:
+        pass
+
     # Get direct converter
-    converter = is_registered(src_type, dst_type)
-    if converter:
-        return converter
+    converter = is_registered(src_type.__name__, dst_type)
 
     # Get converter from bases
-    for base in value.__class__.__bases__:
-        src_type = base.__name__
-        converter = is_registered(src_type, dst_type)
-        if converter:
-            return converter
-
-    return None
+    if not converter:
+        for base in src_type.__mro__[1:]:
+            converter = converters.get((base.__name__, dst_type), None)
+            if converter:
+                break
+
+    _dispatch[(src_type, dst_type)] = converter
+    return converter
 
 
 def convert(value : object,
@@ -0,0 +1,387 @@
+# Package: Graphic Server Protocol
+# Authors: Nicolas P .Rougier <nicolas.rougier@gmail.com>
+# License: BSD 3 clause
+"""
+Append-only command journal (.gspj)
+
+A journal is made of a file header followed by segments. Each segment
+holds the commands appended by a single flush as command frames (see
+`gsp.io.binary`) followed by a footer indexing these frames:
+
+```
+journal := "GSPJ" version:u32 segment*
+segment := frame* footer
+footer  := "GSPI" count:u32 previous:u64 offset:u64*count crc:u32 size:u32 "GSPI"
+```
+
+`previous` is the offset of the previous footer (0 for the first
+one), offsets are the absolute offsets of the frames of the segment,
+crc is the CRC32 of the segment (frames and offsets) and size is the
+size of the footer such that the last footer can be found from the
+end of the file. A segment is written and synced at once such that a
+crash can only leave a torn segment at the end of the file. Such
+segment is discarded (and the index rebuilt) when the journal is
+reopened.
+"""
+import os
+import time
+import zlib
+import struct
+import weakref
+from . command import CommandQueue
+from . import binary
+
+MAGIC = b"GSPJ"
+""" Magic bytes at the start of any journal """
+
+VERSION = 1
+""" Version of the journal format """
+
+FOOTER = b"GSPI"
+""" Magic bytes at the start and end of any footer """
+
+_footer_head = struct.Struct("<4sIQ")
+_footer_tail = struct.Struct("<II4s")
+
+
+class _Writer:
+    """ Stream wrapper that computes the CRC32 of written data """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.crc = 0
+
+    def write(self, data):
+        self.crc = zlib.crc32(data, self.crc)
+        return self.stream.write(data)
+
+
+def _footer(data, offset):
+    """
+    Read the footer at offset and return (previous, offsets, crc,
+    size) or None if there is no complete footer at offset.
+    """
+
+    if offset + _footer_head.size > len(data):
+        return None
+    magic, count, previous = _footer_head.unpack_from(data, offset)
+    size = _footer_head.size + 8*count + _footer_tail.size
+    if magic != FOOTER or offset + size > len(data):
+        return None
+    offsets = struct.unpack_from(f"<{count}Q", data, offset + _footer_head.size)
+    crc, _size, magic = _footer_tail.unpack_from(data, offset + size - _footer_tail.size)
+    if magic != FOOTER or _size != size:
+        return None
+    return previous, list(offsets), crc, size
+
+
+def _segments(data, offset):
+    """
+    Iterate over the complete and valid segments starting at offset
+    and yield (frame offsets, footer offset, end offset) for each of
+    them. Iteration stops at the first incomplete or invalid segment.
+    """
+
+    start, frames = offset, []
+    while offset < len(data):
+        if bytes(data[offset:offset+4]) == FOOTER:
+            footer = _footer(data, offset)
+            if footer is None:
+                return
+            previous, offsets, crc, size = footer
+            entries = bytes(data[offset+_footer_head.size:offset+size-_footer_tail.size])
+            if (offsets != frames or
+                zlib.crc32(entries, zlib.crc32(data[start:offset])) != crc):
+                return
+            yield frames, offset, offset + size
+            offset = start = offset + size
+            frames = []
+        else:
+            size = binary.frame_size(data, offset)
+            if size is None:
+                return
+            frames.append(offset)
+            offset += size
+
+
+def _check(data, filename):
+    """ Check the journal header """
+
+    if len(data) < binary._file_header.size:
+        raise ValueError(f"{filename} is not a GSP journal")
+    magic, version = binary._file_header.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{filename} is not a GSP journal")
+    if version > VERSION:
+        raise ValueError(f"Unsupported GSP journal version ({version})")
+
+
+def _last_footer(data):
+    """ Return the offset of the last footer (found from the end of file) or None """
+
+    if len(data) < binary._file_header.size + _footer_tail.size:
+        return None
+    crc, size, magic = _footer_tail.unpack_from(data, len(data) - _footer_tail.size)
+    offset = len(data) - size
+    if magic != FOOTER or offset < binary._file_header.size:
+        return None
+    if _footer(data, offset) is None:
+        return None
+    return offset
+
+
+def index(data):
+    """
+    Return the offsets of all the committed frames of a journal. The
+    chain of footers is used when the journal ends with a footer, else
+    the journal is scanned.
+    """
+
+    footer = _last_footer(data)
+    if footer is None:
+        return [offset for frames, footer, end in
+                _segments(data, binary._file_header.size) for offset in frames]
+
+    segments = []
+    while footer:
+        previous, offsets, crc, size = _footer(data, footer)
+        segments.append(offsets)
+        footer = previous
+    return [offset for offsets in reversed(segments) for offset in offsets]
+
+
+def _recover(data):
+    """
+    Return the offset of the last valid footer (0 if none) and the
+    offset of the end of the last valid segment.
+    """
+
+    footer = _last_footer(data)
+    if footer is not None:
+        # Fast path: only the last segment is checked
+        previous, offsets, crc, size = _footer(data, footer)
+        start = offsets[0] if offsets else footer
+        for frames, _footer_offset, end in _segments(data, start):
+            if end == len(data):
+                return footer, end
+
+    footer, end = 0, binary._file_header.size
+    for frames, footer, end in _segments(data, end):
+        pass
+    return footer, end
+
+
+_flushed = weakref.WeakKeyDictionary()
+"""
+Commands (list and count) of queues that have been journaled in this
+process, indexed by queue and journal filename
+"""
+
+
+class Journal:
+    """
+    Append-only journal of the commands of a queue. Each flush appends
+    the commands that have been recorded since the previous flush.
+    """
+
+    def __init__(self, filename, queue = None, sync = True):
+        """
+        Open (or create) a journal.
+
+        When the journal already exists, any torn segment at its end is
+        discarded. Commands of the queue that have already been
+        journaled in this process (by a previous journal of the same
+        queue on the same file) are not appended again while the whole
+        queue is appended otherwise (command ids are not unique across
+        sessions).
+
+        Parameters
+        ----------
+        filename : str
+            Name of the journal file
+        queue : CommandQueue
+            Queue whose commands are journaled (default to the active one)
+        sync : bool
+            Whether to fsync the file after each flush
+        """
+
+        self.filename = filename
+        self.queue = queue or CommandQueue("active")
+        self.sync = sync
+        self._key = os.path.abspath(filename)
+        self._commands = self.queue.commands
+        self._count = 0
+        self._digests = {}
+        self._footer = 0
+
+        if not os.path.exists(filename) or not os.path.getsize(filename):
+            with open(filename, "wb") as stream:
+                stream.write(binary._file_header.pack(MAGIC, VERSION))
+            end = binary._file_header.size
+        else:
+            data = binary._map(filename)
+            _check(data, filename)
+            self._footer, end = _recover(data)
+            del data
+            commands, count = _flushed.get(self.queue, {}).get(self._key, (None, 0))
+            if commands is self._commands:
+                self._count = count
+
+        self._stream = open(filename, "r+b")
+        self._stream.truncate(end)
+        self._stream.seek(end)
+
+    def flush(self):
+        """
+        Append the commands recorded since last flush as a new segment
+        and return the number of appended commands.
+        """
+
+        commands = self.queue.commands
+        if commands is not self._commands or len(commands) < self._count:
+            # Queue has been emptied or replaced
+            self._commands, self._count = commands, 0
+        count = self.append(commands[self._count:])
+        self._count = len(commands)
+        _flushed.setdefault(self.queue, {})[self._key] = commands, self._count
+        return count
+
+    def append(self, commands):
+        """
+        Append the given commands as a new segment and return the
+        number of appended commands.
+        """
+
+        if not commands:
+            return 0
+
+        stream = self._stream
+        writer = _Writer(stream)
+        start = offset = stream.tell()
+        offsets = []
+        # Payloads written in this segment can only be referenced once
+        # the segment has been committed
+        digests = dict(self._digests)
+        try:
+            for command in commands:
+                offsets.append(offset)
+                offset += binary.dump_command(command, writer, offset, digests)
+
+            entries = struct.pack(f"<{len(offsets)}Q", *offsets)
+            crc = zlib.crc32(entries, writer.crc)
+            size = _footer_head.size + len(entries) + _footer_tail.size
+            stream.write(_footer_head.pack(FOOTER, len(offsets), self._footer))
+            stream.write(entries)
+            stream.write(_footer_tail.pack(crc, size, FOOTER))
+            stream.flush()
+            if self.sync:
+                os.fsync(stream.fileno())
+        except BaseException:
+            # The torn segment is discarded
+            stream.seek(start)
+            stream.truncate()
+            raise
+
+        self._digests = digests
+
+        self._footer = offset
+        return len(commands)
+
+    def close(self, flush = True):
+        """ Flush pending commands (if flush is True) and close the journal """
+
+        if not self._stream.closed:
+            if flush:
+                self.flush()
+            self._stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+_journals = {}
+""" Journals opened by `save`, indexed by filename """
+
+def save(filename, queue = None, sync = True):
+    """
+    Append the commands of the queue recorded since the last save to
+    the given journal.
+    """
+
+    queue = queue or CommandQueue("active")
+    key = os.path.abspath(filename)
+    journal = _journals.get(key)
+    if journal is None or journal.queue is not queue or journal._stream.closed:
+        journal = _journals[key] = Journal(filename, queue, sync)
+    journal.sync = sync
+    journal.flush()
+
+
+def iterload(filename):
+    """ Iterate over the commands of a journal """
+
+    data = binary._map(filename)
+    _check(data, filename)
+    for offset in index(data):
+        command, _ = binary.load_frame(data, offset)
+        yield command
+
+
+def load(filename, queue = None, until = None):
+    """
+    Load commands from a journal into the default command queue. If
+    until is given (command id), loading stops after this command.
+    """
+
+    # Get default command queue
+    queue = queue or CommandQueue("active")
+    queue.empty()
+
+    for command in iterload(filename):
+        queue.push(command)
+        if until is not None and command.id == until:
+            return queue
+    if until is not None:
+        raise ValueError(f"Unknown command ({until})")
+    return queue
+
+
+def tail(filename, timeout = None, interval = 0.1):
+    """
+    Iterate over the commands of a journal that may still be written
+    by another process. New commands are yielded as soon as their
+    segment has been committed.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the journal file
+    timeout : float
+        Stop when no new command has been appended during timeout
+        seconds (never stop if None)
+    interval : float
+        Delay (in seconds) between two checks of the journal
+    """
+
+    offset = binary._file_header.size
+    last = time.monotonic()
+    data, size = b"", 0
+    while True:
+        # The journal is mapped again only when its size has changed
+        current = os.path.getsize(filename) if os.path.exists(filename) else 0
+        if current != size:
+            data, size = binary._map(filename) if current else b"", current
+            if len(data) >= binary._file_header.size:
+                _check(data, filename)
+                for frames, footer, end in _segments(data, offset):
+                    for frame in frames:
+                        command, _ = binary.load_frame(data, frame)
+                        yield command
+                    offset = end
+                    last = time.monotonic()
+        if timeout is not None and time.monotonic() - last > timeout:
+            return
+        time.sleep(interval)
@@ -4,10 +4,118 @@
 import io
 import sys
 import json
+import re
 import base64
+import hashlib
+import pathlib
+import concurrent.futures
 import numpy as np
 from gsp.object import Object
 from . command import CommandQueue, Command
+from . convert import convert, register
+from . import codec as codecs
+
+PARALLEL = 2**20
+""" Size (in bytes) from which buffers are encoded on a thread pool """
+
+
+class Blob:
+    """
+    Lazy reference to a buffer stored in a sidecar file. The file is
+    only memory-mapped when the blob is first converted to an array.
+    """
+
+    def __init__(self, filename, offset, nbytes, dtype):
+        """
+        Parameters
+        ----------
+        filename:
+            Name of the sidecar file
+        offset:
+            Offset (in bytes) of the buffer in the sidecar file
+        nbytes:
+            Size (in bytes) of the buffer
+        dtype:
+            Type of the buffer items (see `numpy_dtype_to_str`)
+        """
+
+        self.filename = filename
+        self.offset = offset
+        self.nbytes = nbytes
+        self.dtype = convert(dtype, "dtype")
+        self._array = None
+
+    def __array__(self, dtype=None, copy=None):
+        if self._array is None:
+            count = self.nbytes // self.dtype.itemsize
+            if count:
+                self._array = np.memmap(self.filename, self.dtype, mode="r",
+                                        offset=self.offset, shape=(count,))
+            else:
+                self._array = np.empty(0, self.dtype)
+        if dtype is not None:
+            return self._array.astype(dtype, copy=bool(copy))
+        return self._array
+
+    def __len__(self):
+        return self.nbytes
+
+    def __repr__(self):
+        return f"Blob({self.filename}, {self.offset}, {self.nbytes}, {self.dtype})"
+
+
+@register("Blob", "memoryview")
+def Blob_to_memoryview(blob):
+    return memoryview(np.asarray(blob)).cast("B")
+
+
+class Encoded:
+    """
+    Lazy compressed buffer. Data is only decompressed when the buffer
+    is first converted to an array.
+    """
+
+    def __init__(self, data, dtype, codec, shuffle=0):
+        """
+        Parameters
+        ----------
+        data:
+            Compressed data, either base64 encoded or stored in a
+            sidecar file (Blob)
+        dtype:
+            Type of the buffer items (see `numpy_dtype_to_str`)
+        codec:
+            Name of the codec (see `gsp.io.codec`)
+        shuffle:
+            Item size used by the shuffle filter (0 means no shuffle)
+        """
+
+        self.data = data
+        self.dtype = convert(dtype, "dtype")
+        self.codec = codec
+        self.shuffle = shuffle
+        self._array = None
+
+    def __array__(self, dtype=None, copy=None):
+        if self._array is None:
+            data = self.data
+            if isinstance(data, str):
+                data = base64.b64decode(data)
+            else:
+                data = np.asarray(data)
+            data = codecs.decode(data, self.codec, self.shuffle)
+            self._array = np.frombuffer(data, self.dtype)
+        if dtype is not None:
+            return self._array.astype(dtype, copy=bool(copy))
+        return self._array
+
+    def __repr__(self):
+        return f"Encoded({self.codec}, {self.dtype})"
+
+
+@register("Encoded", "memoryview")
+def Encoded_to_memoryview(encoded):
+    return memoryview(np.asarray(encoded)).cast("B")
 
 def default(obj):
     from gsp.core.types import Color
@@ -57,8 +165,154 @@ def dump_command(command, stream=sys.stdout):
     else:
         return payload
 
-def dump(queue=None, filename=None):
-    """ Save command queue to a file """
+def dump_blob(value, stream, filename):
+    """
+    Write a buffer to the given sidecar stream and return a reference
+    to it.
+    """
+
+    if isinstance(value, np.ndarray):
+        data = np.ascontiguousarray(value)
+    else:
+        data = np.frombuffer(bytes(value), np.ubyte)
+
+    # Buffers are aligned on 64 bytes
+    offset = stream.tell()
+    offset += stream.write(bytes(-offset % 64))
+    stream.write(data.reshape(-1).view(np.ubyte))
+    return { "file" : filename,
+             "offset" : offset,
+             "nbytes" : data.nbytes,
+             "dtype" : convert(data.dtype, "str") }
+
+
+def encode_buffer(value, compression="auto", shuffle=False):
+    """
+    Compress a buffer and return a description of the compressed
+    buffer, or the buffer itself if it has not been compressed.
+
+    Parameters
+    ----------
+    value:
+        Buffer to compress (np.ndarray, bytes or memoryview)
+    compression:
+        Name of the codec to use or "auto" to choose the codec
+        according to the size of the buffer and the measured
+        compression ratio (see `gsp.io.codec.choose`)
+    shuffle:
+        Whether to apply the byte-shuffle filter on float arrays
+    """
+
+    if isinstance(value, np.ndarray):
+        data = np.ascontiguousarray(value)
+    else:
+        data = np.frombuffer(bytes(value), np.ubyte)
+
+    itemsize = 0
+    if shuffle and data.dtype.kind == "f" and data.dtype.itemsize > 1:
+        itemsize = data.dtype.itemsize
+    raw = data.reshape(-1).view(np.ubyte)
+    codec = compression
+    if compression == "auto":
+        codec = codecs.choose(raw, itemsize)
+    if codec is None:
+        return value
+
+    return { "codec" : codec,
+             "shuffle" : itemsize,
+             "dtype" : convert(data.dtype, "str"),
+             "data" : codecs.encode(raw, codec, itemsize) }
+
+
+def digest(value):
+    """ Return the digest of a buffer content (and type) """
+
+    if isinstance(value, np.ndarray):
+        data = np.ascontiguousarray(value)
+        checksum = hashlib.blake2b(data.reshape(-1).view(np.ubyte), digest_size=16)
+        checksum.update(convert(data.dtype, "str").encode())
+    else:
+        checksum = hashlib.blake2b(value, digest_size=16)
+    return checksum.hexdigest()
+
+
+def parallel(function, values, workers=None):
+    """
+    Return the list of function(value) for all values, computed on a
+    thread pool when at least two of the values are bigger than
+    PARALLEL bytes (zlib, lzma and hashlib release the GIL on large
+    buffers). Order of values is preserved.
+
+    Parameters
+    ----------
+    function:
+        Function to apply
+    values:
+        List of buffers (np.ndarray, bytes, memoryview or lazy buffers)
+    workers:
+        Maximum number of threads (default to the thread pool default).
+        No thread is used if workers is 0 or 1.
+    """
+
+    def nbytes(value):
+        if isinstance(value, Encoded):
+            return len(value.data)
+        return memoryview(value).nbytes
+
+    if (workers is not None and workers <= 1) or \
+       sum(nbytes(value) >= PARALLEL for value in values) < 2:
+        return [function(value) for value in values]
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        return list(executor.map(function, values))
+
+
+def dump_sidecar(value, stream, filename, threshold):
+    """
+    Write a (possibly compressed) buffer to the given sidecar stream
+    if its size is bigger than threshold.
+    """
+
+    if isinstance(value, dict):
+        # Compressed data is stored as raw bytes
+        if len(value["data"]) > threshold:
+            value["data"] = dump_blob(value["data"], stream, filename)
+    elif memoryview(value).nbytes > threshold:
+        value = dump_blob(value, stream, filename)
+    return value
+
+
+def dump(queue=None, filename=None, threshold=None,
+         compression=None, shuffle=False, dedup=False, workers=None):
+    """
+    Save command queue to a file
+
+    Parameters
+    ----------
+    queue:
+        Command queue to save (default to the active one)
+    filename:
+        Name of the file to write. If None, return the JSON string.
+    threshold:
+        If not None (and filename is given), buffers bigger than
+        threshold bytes are written to a sidecar `.bin` file next to
+        filename and only referenced from the JSON file as
+        `{file, offset, nbytes, dtype}`.
+    compression:
+        If not None, buffers are compressed using the given codec
+        ("zlib", "lzma" or "auto", see `encode_buffer`) and stored
+        as `{codec, shuffle, dtype, data}`.
+    shuffle:
+        Whether to apply the byte-shuffle filter on compressed float
+        arrays.
+    dedup:
+        Whether to store identical buffers only once. The first
+        occurrence is stored as `{digest, value}` and the others as
+        `{digest}`.
+    workers:
+        Maximum number of threads used to encode (compress and base64
+        encode) large buffers, see `parallel`. The output does not
+        depend on the number of workers.
+    """
 
     queue = queue or CommandQueue("active")
     commands = []
@@ -66,38 +320,267 @@ def dump(queue=None, filename=None):
         commands.append(dump_command(command, stream=None))
     payload = { "gsp_version": "1.0", "commands" : commands }
 
+    buffers = []
+    for command in commands:
+        parameters = command["parameters"]
+        for key, value in parameters.items():
+            # Lazy buffers (from a loaded file) are saved as arrays
+            if isinstance(value, (Blob, Encoded)):
+                value = parameters[key] = np.asarray(value)
+            if isinstance(value, (np.ndarray, bytes, memoryview)):
+                buffers.append((parameters, key))
+
+    values = [parameters[key] for parameters, key in buffers]
+    digests = parallel(digest, values, workers) if dedup else [None]*len(values)
+    counts = {}
+    for buffer_digest in digests:
+        counts[buffer_digest] = counts.get(buffer_digest, 0) + 1
+
+    # Only the first occurrence of a deduplicated buffer is encoded
+    stored, unique = set(), []
+    for (parameters, key), buffer_digest in zip(buffers, digests):
+        if buffer_digest in stored:
+            parameters[key] = { "digest" : buffer_digest }
+        else:
+            if buffer_digest is not None and counts[buffer_digest] > 1:
+                stored.add(buffer_digest)
+            unique.append((parameters, key, buffer_digest))
+
+    sidecar = None
+    if filename is not None and threshold is not None:
+        sidecar = pathlib.Path(filename).with_suffix(".bin")
+
+    def encode(value):
+        if compression is not None:
+            value = encode_buffer(value, compression, shuffle)
+        if sidecar is None:
+            # Base64 encoding is done here instead of json.dump
+            if isinstance(value, dict):
+                value["data"] = default(value["data"])
+            else:
+                value = default(value)
+        return value
+
+    values = parallel(encode, [parameters[key] for parameters, key, _ in unique], workers)
+
+    stream = open(sidecar, "wb") if sidecar is not None else None
+    try:
+        for (parameters, key, buffer_digest), value in zip(unique, values):
+            if stream is not None:
+                value = dump_sidecar(value, stream, sidecar.name, threshold)
+            if buffer_digest in stored:
+                value = { "digest" : buffer_digest, "value" : value }
+            parameters[key] = value
+    finally:
+        if stream is not None:
+            stream.close()
+
     if filename is None:
         return json.dumps(payload, indent=2, default=default)
-    else:
-        with open(filename, "w") as stream:
-            json.dump(payload, stream, default=default)
 
+    with open(filename, "w") as stream:
+        json.dump(payload, stream, default=default)
 
-def save(filename, queue = None ):
-    """ Save command queue to a file """
+
+def save(filename, queue = None, threshold = None,
+         compression = None, shuffle = False, dedup = False, workers = None):
+    """ Save command queue to a file (see `dump` for parameters) """
 
     queue = queue or CommandQueue("active")
-    dump(queue, filename)
+    dump(queue, filename, threshold, compression, shuffle, dedup, workers)
+
+
+class _Parser:
+    """
+    Incremental parser for the top level structure of a command file
+    that only keeps in memory the part of the file being decoded.
+    """
+
+    whitespace = re.compile(r"[ \t\n\r]*")
+
+    def __init__(self, stream, chunksize):
+        self.stream = stream
+        self.chunksize = chunksize
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.index = 0
+        self.eof = False
+
+    def read(self, size=None):
+        """ Read more data from stream, return False at end of file """
+
+        chunk = self.stream.read(size or self.chunksize)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.index:] + chunk
+        self.index = 0
+        return True
+
+    def peek(self):
+        """ Return the next non whitespace character """
+
+        while True:
+            self.index = self.whitespace.match(self.buffer, self.index).end()
+            if self.index < len(self.buffer):
+                return self.buffer[self.index]
+            if not self.read():
+                raise ValueError("Unexpected end of file")
+
+    def expect(self, chars):
+        """ Consume and return the next character that must be one of chars """
+
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f"Expected one of '{chars}', got '{char}'")
+        self.index += 1
+        return char
 
+    def value(self):
+        """ Decode and return the next JSON value """
 
-def load(filename, queue = None):
-    """ Load commands from JSON file into the default command queue """
+        self.peek()
+        size = self.chunksize
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.index)
+                # A number may have been cut by the end of the buffer
+                if end < len(self.buffer) or self.eof:
+                    self.index = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Value is incomplete, read more (exponentially)
+            self.read(size)
+            size *= 2
 
+
+def iterparse(stream, chunksize=2**16):
+    """
+    Iterate over the JSON representation of the commands contained
+    in a command file stream, decoding one command at a time.
+    """
+
+    parser = _Parser(stream, chunksize)
+    parser.expect("{")
+    if parser.peek() == "}":
+        return
+    while True:
+        key = parser.value()
+        parser.expect(":")
+        if key == "commands":
+            parser.expect("[")
+            if parser.peek() == "]":
+                parser.index += 1
+            else:
+                while True:
+                    yield parser.value()
+                    if parser.expect(",]") == "]":
+                        break
+        else:
+            parser.value()
+        if parser.expect(",}") == "}":
+            return
+
+
+def load_buffer(value, directory=".", buffers=None):
+    """
+    Return a lazy buffer (Blob or Encoded) if value describes a buffer
+    stored in a sidecar file or compressed, else return value.
+    Deduplicated buffers are stored in (or retrieved from) the
+    buffers dictionary, indexed by digest, such that all occurrences
+    share the same content (and have the same type as buffers that
+    are not deduplicated).
+    """
+
+    if isinstance(value, dict):
+        if value.keys() == {"file", "offset", "nbytes", "dtype"}:
+            return Blob(pathlib.Path(directory) / value["file"], value["offset"],
+                        value["nbytes"], value["dtype"])
+        elif value.keys() == {"codec", "shuffle", "dtype", "data"}:
+            return Encoded(load_buffer(value["data"], directory), value["dtype"],
+                           value["codec"], value["shuffle"])
+        elif value.keys() == {"digest", "value"}:
+            buffer = load_buffer(value["value"], directory)
+            if buffers is not None:
+                buffers[value["digest"]] = buffer
+            return buffer
+        elif value.keys() == {"digest"}:
+            if buffers is None or value["digest"] not in buffers:
+                raise ValueError(f"Unknown buffer digest ({value['digest']})")
+            return buffers[value["digest"]]
+    return value
+
+
+def load_command(command, directory=".", buffers=None):
+    """ Build a command from its JSON representation """
+
+    method = command["method"]
+    try:
+        classname, methodname = method.split("/")
+    except ValueError:
+        classname, methodname = method, "__init__"
+    parameters = command["parameters"]
+    for key, value in parameters.items():
+        parameters[key] = load_buffer(value, directory, buffers)
+    return Command(classname,  methodname, parameters,
+                   cid = command.get("id"), timestamp = command.get("timestamp"))
+
+
+def iterload(filename):
+    """
+    Iterate over the commands of a JSON file. Commands are parsed and
+    built one at a time (keeping their original id and timestamp) such
+    that they can be executed before the file has been fully read:
+
+    ```python
+    queue.run(backend, gsp.io.json.iterload(filename))
+    ```
+    """
+
+    directory = pathlib.Path(filename).parent
+    buffers = {}
     with open(filename) as stream:
-        commands = json.load(stream)["commands"]
+        for command in iterparse(stream):
+            yield load_command(command, directory, buffers)
+
+
+def decode_buffers(commands, workers=None):
+    """
+    Decompress the (lazy) compressed buffers of the given commands,
+    using a thread pool for large buffers (see `parallel`).
+    """
+
+    encoded = {}
+    for command in commands:
+        for value in command.parameters.values():
+            if isinstance(value, Encoded):
+                encoded[id(value)] = value
+    parallel(np.asarray, list(encoded.values()), workers)
+
+
+def load(filename, queue = None, until = None, decode = False, workers = None):
+    """
+    Load commands from JSON file into the default command queue. If
+    until is given (command id), loading stops after this command.
+    Compressed buffers are decompressed when first used unless decode
+    is True, in which case they are decompressed at once using a
+    thread pool of workers threads (see `decode_buffers`).
+    """
 
     # Get default command queue
     queue = queue or CommandQueue("active")
     queue.empty()
 
-    for command in commands:
-        method = command["method"]
-        try:
-            classname, methodname = method.split("/")
-        except ValueError:
-            classname, methodname = method, "__init__"
-        parameters = command["parameters"]
-        command = Command(classname,  methodname, parameters)
+    for command in iterload(filename):
         queue.push(command)
+        if until is not None and command.id == until:
+            break
+    else:
+        if until is not None:
+            raise ValueError(f"Unknown command ({until})")
 
+    if decode:
+        decode_buffers(queue.commands, workers)
     return queue
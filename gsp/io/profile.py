@@ -0,0 +1,169 @@
+# Package: Graphic Server Protocol
+# Authors: Nicolas P .Rougier <nicolas.rougier@gmail.com>
+# License: BSD 3 clause
+"""
+Command level profiling of command execution. A profiler records the
+wall time, the peak memory allocated (using tracemalloc) and the size
+of the buffer parameters of each executed command:
+
+```python
+with Profiler() as profiler:
+    queue.run(backend, profiler=profiler)
+print(profiler)
+profiler.save("trace.json") # chrome://tracing or ui.perfetto.dev
+```
+"""
+import os
+import json
+import time
+import threading
+import tracemalloc
+from collections import namedtuple
+import numpy as np
+from . convert import Converter
+
+Record = namedtuple("Record", ["cid", "classname", "methodname", "start",
+                               "duration", "allocated", "payload", "thread"])
+"""
+Profile of a single command execution (times in ns, sizes in bytes).
+The allocated size is the peak of the memory traced during execution
+above the memory traced before execution, such that temporary buffers
+are accounted for.
+"""
+
+Stats = namedtuple("Stats", ["count", "duration", "allocated", "payload"])
+""" Aggregated profile of commands (times in ns, sizes in bytes) """
+
+
+def payload_size(command):
+    """ Return the total size (in bytes) of the buffer parameters of a command """
+
+    from . json import Blob, Encoded
+
+    size = 0
+    for value in command.parameters.values():
+        if isinstance(value, Converter):
+            value = value.value
+        if isinstance(value, (np.ndarray, bytes, memoryview)):
+            size += memoryview(value).nbytes
+        elif isinstance(value, Blob):
+            size += value.nbytes
+        elif isinstance(value, Encoded):
+            size += len(value.data)
+    return size
+
+
+class Profiler:
+    """
+    Profiler of command executions (see `CommandQueue.run` and
+    `Command.execute`).
+    """
+
+    def __init__(self, memory = True):
+        """
+        Create a new profiler.
+
+        Parameters
+        ----------
+        memory : bool
+            Whether to record peak allocated memory (using tracemalloc,
+            which slows down execution significantly)
+        """
+
+        self.memory = memory
+        self.records = []
+        self._origin = time.perf_counter_ns()
+        self._tracing = False
+
+    def start(self):
+        """ Start memory tracing (if needed) """
+
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+
+    def stop(self):
+        """ Stop memory tracing if it has been started by the profiler """
+
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def execute(self, execute, command):
+        """
+        Execute command using the given execute function (e.g.
+        `Dispatcher.execute`) and record its profile.
+        """
+
+        memory = self.memory and tracemalloc.is_tracing()
+        if memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter_ns()
+        try:
+            return execute(command)
+        finally:
+            duration = time.perf_counter_ns() - start
+            allocated = tracemalloc.get_traced_memory()[1] - before if memory else 0
+            self.records.append(Record(int(command.id), command.classname,
+                                       command.methodname, start - self._origin,
+                                       duration, allocated, payload_size(command),
+                                       threading.get_ident()))
+
+    def stats(self):
+        """
+        Return the profile aggregated per (classname, methodname),
+        sorted by decreasing total duration.
+        """
+
+        stats = {}
+        for record in self.records:
+            key = record.classname, record.methodname
+            count, duration, allocated, payload = stats.get(key, (0, 0, 0, 0))
+            stats[key] = Stats(count + 1, duration + record.duration,
+                               allocated + record.allocated, payload + record.payload)
+        return dict(sorted(stats.items(), key=lambda item: -item[1].duration))
+
+    def __str__(self):
+        lines = ["%-32s %8s %12s %12s %12s" % ("Command", "Count", "Time (ms)",
+                                                "Alloc (kB)", "Payload (kB)")]
+        for (classname, methodname), stats in self.stats().items():
+            name = classname if methodname == "__init__" else f"{classname}/{methodname}"
+            lines.append("%-32s %8d %12.3f %12.1f %12.1f" % (
+                name, stats.count, stats.duration / 1e6,
+                stats.allocated / 1024, stats.payload / 1024))
+        return "\n".join(lines)
+
+    def trace(self):
+        """ Return the records as Chrome trace events (JSON object format) """
+
+        pid = os.getpid()
+        events = []
+        for record in self.records:
+            name = record.classname
+            if record.methodname != "__init__":
+                name += "/" + record.methodname
+            events.append({ "name" : name,
+                            "cat" : "command",
+                            "ph" : "X",
+                            "ts" : record.start / 1000,
+                            "dur" : record.duration / 1000,
+                            "pid" : pid,
+                            "tid" : record.thread,
+                            "args" : { "id" : record.cid,
+                                       "allocated" : record.allocated,
+                                       "payload" : record.payload } })
+        return { "traceEvents" : events, "displayTimeUnit" : "ms" }
+
+    def save(self, filename):
+        """ Save the records as a Chrome trace file """
+
+        with open(filename, "w") as stream:
+            json.dump(self.trace(), stream)
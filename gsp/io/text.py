@@ -3,80 +3,42 @@
 # License: BSD 3 clause
 import io
 import sys
-from datetime import datetime
-from gsp.object import Object, OID
-from . command import CommandQueue, Command, Converter, CID
+from . import ansi
+from . ansi import summary, format_value
 
 def bold(s): return s
 def dim(s): return s
 
-def dump_command(command, stream=sys.stdout):
+def write_command(command, stream, limit=None):
     """
-    Dump a command to given stream in text (ansi) format
-
-    This is mostly useful for the documentatipn where the TEXT tab of
-    any commands can be dumped via markdow-exec.
+    Write a command to given text stream (see
+    `gsp.io.ansi.write_command`)
     """
 
-    s = ""
-
-    # Get timestamp in date format
-    date = datetime.fromtimestamp(command.timestamp)
-
-    # Check which method has been called
-    if (command.methodname is None or not len(command.methodname)):
-        method = command.classname
-    elif "." in command.methodname:
-        method = command.methodname
-    else:
-        method = "%s/%s" % (command.classname, command.methodname)
-    s += dim("%d. " % command.id) + bold("COMMAND\n")
-    # s += "%d. " % command.id + bold("COMMAND:") + ' "%s" (str)\n' % (method)
-    s += '     - METHOD: "%s"' % (method) + dim(" (str)\n")
-    s += "     - COMMAND_ID: %s" % command.id + dim(" (int)\n")
-    s += "     - TIMESTAMP: %s" % date.strftime("%Y-%m-%dT%H:%M:%S.%f") + dim(" (datetime)\n")
-    s += dim("   PARAMETERS\n")
-    for key,value in command.parameters.items():
-
-        # Immediate conversion for lisibility in the documentation
-        if isinstance(value, Converter):
-            value = str(value()) + " (converted)"
+    ansi.write_command(command, stream, limit, bold, dim)
 
-        if key == "id":
-            s += "     - OBJECT_ID: %s" % value + dim(" (int)\n")
-        else:
-            vtype = command.annotations[key]
-            if hasattr(vtype, "__name__"):
-                vtype = vtype.__name__
-            else:
-                vtype = str(vtype)
-            s +="     - %s: %s" % (key.upper(), value)
-            s += dim(" (%s)\n" % (vtype))
+def dump_command(command, stream=None, limit=None):
+    """
+    Dump a command to given stream (default to sys.stdout) in text
+    format.
 
-    if stream == sys.stdout:
-        print(s)
-    else:
-        return s
+    This is mostly useful for the documentatipn where the TEXT tab of
+    any commands can be dumped via markdow-exec.
+    """
 
-def dump(queue=None, filename=None):
-    """ Save command queue to a file """
+    stream = stream or sys.stdout
+    write_command(command, stream, limit)
+    stream.write("\n")
 
-    queue = queue or CommandQueue.get_default()
-    commands = ""
-    for command in queue._commands:
-        commands += dump_command(command, stream=None)
-        commands += "\n"
+def dump(queue=None, filename=None, limit=None):
+    """ Save command queue to a file (see `gsp.io.ansi.dump`) """
 
-    if filename is None:
-        return commands
-    else:
-        with open(filename, "w") as stream:
-            stream.write(commands)
+    return ansi.dump(queue, filename, limit, write_command)
 
-def save(queue, filename):
+def save(queue, filename, limit=None):
     """ Save command queue to a file """
 
-    dump(queue, filename)
+    dump(queue, filename, limit)
 
 
 def load(filename):
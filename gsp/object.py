@@ -6,7 +6,13 @@
 The role of the Object class is to facilitate the writing of the reference
 implementation. It is *not* part of the protocol.
 """
+import weakref
 import itertools
+import threading
+
+_local = threading.local()
+""" Thread local state (active namespaces, see `Namespace`) """
+
 
 class OID(int):
     """
@@ -19,23 +25,146 @@ class OID(int):
     corresponding object.
     """
 
-    # Identifier counter
+    # Identifier counter (process wide, see Namespace.counter)
     counter = itertools.count()
 
     def __new__(cls, oid=None):
         """
-        Creates a new identifier unless oid is provided
+        Creates a new identifier (using the counter of the active
+        namespace if any) unless oid is provided
         """
 
         if oid is None:
-            oid = 1 + next(OID.counter)
+            namespace = Namespace.current()
+            counter = OID.counter if namespace is None else namespace.counter
+            oid = 1 + next(counter)
         else:
             oid = int(oid)
         return super(OID, cls).__new__(cls, oid)
 
 
+class WeakRegistry(weakref.WeakValueDictionary):
+    """
+    Registry of objects holding weak references (see `registry`),
+    except for pinned objects that are kept alive until they are
+    removed from the registry (e.g. objects created by the replay of
+    commands, that nothing else references until they are deleted).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pinned = {}
+
+    def pin(self, object):
+        """ Keep object alive until it is removed from the registry """
+
+        self.pinned[object.id] = object
+
+    def __delitem__(self, key):
+        self.pinned.pop(key, None)
+        super().__delitem__(key)
+
+    def pop(self, key, *args):
+        self.pinned.pop(key, None)
+        return super().pop(key, *args)
+
+    def clear(self):
+        self.pinned.clear()
+        super().clear()
+
 
-class Object:
+class Namespace:
+    """
+    A namespace owns a registry of objects, an object id counter and
+    a command queue such that several independent scenes or replays
+    can live in the same process, possibly in different threads. A
+    namespace is active in a thread inside a `with` block:
+
+    ```python
+    namespace = Namespace()
+    with namespace:
+        queue.run(backend)
+    canvas = namespace.objects[canvas_id]
+    ```
+
+    Outside of any namespace, the process wide registry, counter and
+    active queue are used (Object.objects, OID.counter,
+    CommandQueue("active")).
+    """
+
+    def __init__(self, objects = None, weak = False, queue = None):
+        """
+        Create a new namespace.
+
+        Parameters
+        ----------
+        objects : dict
+            Registry of objects (a new one if None)
+        weak : bool
+            Whether a new registry holds weak references (see `registry`)
+        queue : CommandQueue
+            Queue where commands are recorded while the namespace is
+            active (a new one when first needed if None)
+        """
+
+        if objects is None:
+            objects = WeakRegistry() if weak else {}
+        self.objects = objects
+        self.counter = itertools.count()
+        self.queue = queue
+
+    @staticmethod
+    def current():
+        """ Return the namespace active in the current thread (or None) """
+
+        stack = getattr(_local, "namespaces", None)
+        return stack[-1] if stack else None
+
+    def clear(self):
+        """
+        Remove all objects, reset the object id counter and empty the
+        command queue
+        """
+
+        self.objects.clear()
+        self.counter = itertools.count()
+        if self.queue is not None:
+            self.queue.empty()
+
+    def __enter__(self):
+        if getattr(_local, "namespaces", None) is None:
+            _local.namespaces = []
+        _local.namespaces.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _local.namespaces.pop()
+
+
+class Registry(type):
+    """
+    Metaclass of Object giving access to the registry of objects
+    (Object.objects) of the namespace active in the current thread, or
+    to the process wide one (see `Namespace`).
+    """
+
+    @property
+    def objects(cls):
+        namespace = Namespace.current()
+        if namespace is None:
+            return Object._objects
+        return namespace.objects
+
+    @objects.setter
+    def objects(cls, objects):
+        namespace = Namespace.current()
+        if namespace is None:
+            Object._objects = objects
+        else:
+            namespace.objects = objects
+
+
+class Object(metaclass = Registry):
     """Generic object with a unique ID
 
     Object is the base class that every other class must inherit in order to
@@ -50,7 +179,9 @@ class Object:
 
     objects (dict):
 
-      Dictionary of objects that have been created and recorded.
+      Dictionary of objects that have been created and recorded (see
+      `registry` for a registry holding weak references and `Namespace`
+      for independent registries).
 
     id (OID):
 
@@ -60,8 +191,9 @@ class Object:
     # Flag indicating if object creations are recorded
     record = True
 
-    # Dictionnaty of created objects based on their id
-    objects = {}
+    # Dictionnaty of created objects based on their id (process wide
+    # registry, see Registry.objects)
+    _objects = {}
 
     def __init__(self):
         self._id = OID()
@@ -79,6 +211,15 @@ class Object:
             Object.objects[newid] = self
         self._id = newid
 
+    def delete(self):
+        """
+        Delete the object, i.e. remove it from the registry of objects
+        such that it can be garbage collected once it is not
+        referenced anymore.
+        """
+
+        Object.objects.pop(self._id, None)
+
     def __hash__(self):
         return self._id
 
@@ -91,3 +232,19 @@ class Object:
             if getattr(self, key) != getattr(other, key):
                 return False
         return True
+
+
+def registry(weak : bool = False):
+    """
+    Set the registry of objects (Object.objects) to a regular
+    dictionary (weak=False) that keeps every recorded object alive or
+    to a dictionary of weak references (weak=True) that only keeps
+    track of objects that are still referenced elsewhere (or that
+    have been replayed, see `WeakRegistry`). Objects already
+    registered are transferred to the new registry.
+    """
+
+    objects = WeakRegistry() if weak else {}
+    objects.update(Object.objects)
+    Object.objects = objects
+    return objects
@@ -7,7 +7,8 @@ from . accessor import Accessor, X, Y, Z, W, R, G, B, A
 from . measure import Measure, Pixel, Inch, Point
 from . measure import Millimeter, Centimeter, Meter, Kilometer
 from . colormap import Colormap
-# from . light import Light
+from . light import Light
 from . out import Out
+from . program import Program
 
 # from . mat4 import Mat4
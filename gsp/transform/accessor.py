@@ -3,7 +3,7 @@
 # License: BSD 3 clause
 import numpy as np
 from gsp.core import Buffer
-from . transform import Transform
+from . transform import Transform, signature
 from gsp.io.command import command
 
 
@@ -33,9 +33,16 @@ class Accessor(Transform):
         transform._key = self._key
         return transform
 
+    def signature(self, variables):
+        key = Transform.signature(self, variables)
+        if key is None or "index" not in variables.keys():
+            return key
+        index = signature(variables["index"], variables)
+        return None if index is None else (key, index)
+
     def evaluate(self, buffers=None):
         if self._next:
-            buffer = self._next.evaluate(buffers)
+            buffer = self._next.evaluate_cached(buffers)
         elif self._buffer is not None:
             buffer = self._buffer
         else:
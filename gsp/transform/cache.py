@@ -0,0 +1,123 @@
+# Package: Graphic Server Protocol
+# Authors: Nicolas P .Rougier <nicolas.rougier@gmail.com>
+# License: BSD 3 clause
+"""
+Cache of transform evaluations. The last result of a transform is
+kept along with the signature of its inputs (see
+`Transform.signature`) and is reused as long as this signature does
+not change. Least recently used results are evicted when the total
+size of the cached results exceeds the cache budget:
+
+```python
+value = transform.evaluate_cached(variables)
+cache.budget = 16*2**20 # 16 MB
+```
+"""
+import weakref
+import threading
+from collections import OrderedDict
+import numpy as np
+
+BUDGET = 64*2**20
+""" Default budget of the cache (in bytes) """
+
+
+def _arrays(value):
+    """ Return the arrays of a value (array or tuple of arrays) """
+
+    if isinstance(value, tuple):
+        return [item for item in value if isinstance(item, np.ndarray)]
+    elif isinstance(value, np.ndarray):
+        return [value]
+    return []
+
+
+class Cache:
+    """
+    LRU cache holding the last result computed for transforms (or
+    other objects such as buffers)
+    """
+
+    def __init__(self, budget : int = BUDGET):
+        """
+        Create a new cache.
+
+        Parameters
+        ----------
+        budget : int
+            Maximum total size (in bytes) of the cached results
+        """
+
+        self.budget = budget
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        """ Number of cached results """
+
+        return len(self._entries)
+
+    def get(self, transform, signature):
+        """
+        Return the cached result of transform for the given signature
+        or None if there is none.
+        """
+
+        with self._lock:
+            entry = self._entries.get(id(transform))
+            if (entry is None or entry[0]() is not transform
+                              or entry[1] != signature):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(id(transform))
+            self.hits += 1
+            return entry[2]
+
+    def put(self, transform, signature, value):
+        """
+        Cache the result of transform for the given signature. Cached
+        arrays (result or tuple of results) are made read-only since
+        they are shared.
+        """
+
+        arrays = _arrays(value)
+        nbytes = sum(array.nbytes for array in arrays) or getattr(value, "nbytes", 0)
+        if value is None or nbytes > self.budget:
+            return
+        for array in arrays:
+            array.flags.writeable = False
+
+        key = id(transform)
+        def release(ref, key=key):
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] is ref:
+                    self._remove(key)
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = weakref.ref(transform, release), signature, value, nbytes
+            self.nbytes += nbytes
+            while self.nbytes > self.budget:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        """ Remove the entry of given key (if any) """
+
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry[3]
+
+    def clear(self):
+        """ Remove all cached results """
+
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+cache = Cache()
+""" Cache used by `Transform.evaluate_cached` """
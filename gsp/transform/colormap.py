@@ -1,9 +1,155 @@
 # Package: Graphic Server Protocol / Matplotlib
 # Authors: Nicolas P .Rougier <nicolas.rougier@gmail.com>
 # License: BSD 3 clause
+import functools
+import numpy as np
 from gsp.core import Buffer
 from gsp.io.command import command
 from gsp.transform import Transform
+from gsp.transform.transform import signature
+
+SAMPLE = 10_000
+""" Size of the reservoir sample used for percentile normalization """
+
+
+@functools.lru_cache(maxsize=None)
+def lut(colormap : str, resolution : int = None, dtype : str = "float32"):
+    """
+    Return the (read-only) lookup table of a colormap, made of
+    resolution RGBA colors followed by the color of invalid values.
+
+    Parameters
+    ----------
+    colormap:
+        Name of the colormap
+    resolution:
+        Number of colors (default to the number of colors of a listed
+        colormap such as "tab10" and to 256 otherwise)
+    dtype:
+        Type of colors, "float32" (in [0,1]) or "uint8" (in [0,255])
+    """
+
+    import matplotlib as mpl
+    import matplotlib.pyplot as plt
+
+    if dtype not in ("float32", "uint8"):
+        raise ValueError(f"Unknown colormap dtype ({dtype})")
+    cmap = plt.get_cmap(colormap)
+    if resolution is None:
+        if isinstance(cmap, mpl.colors.ListedColormap):
+            resolution = cmap.N
+        else:
+            resolution = 256
+    if resolution != cmap.N:
+        cmap = cmap.resampled(resolution)
+    colors = np.empty((resolution + 1, 4))
+    colors[:-1] = cmap(np.arange(resolution))
+    colors[-1] = mpl.colors.to_rgba(cmap.get_bad())
+    if dtype == "uint8":
+        # Same as matplotlib (bytes=True)
+        colors = (colors * 255).astype(np.uint8)
+    else:
+        colors = colors.astype(np.float32)
+    colors.flags.writeable = False
+    return colors
+
+
+class Bounds:
+    """
+    Bounds (vmin, vmax) of the values mapped by a colormap. Bounds
+    are only computed again when values have changed (according to
+    their signature) and, for values that only grow by appending,
+    only new values are taken into account. Percentile bounds are
+    estimated from a reservoir sample of bounded size.
+    """
+
+    def __init__(self, percentile : float = None, size : int = SAMPLE,
+                       seed : int = None):
+        """
+        Create new bounds.
+
+        Parameters
+        ----------
+        percentile :
+            Percentage of values clipped at both ends (None for min/max)
+        size :
+            Size of the reservoir sample (percentile bounds)
+        seed :
+            Seed of the random generator (percentile bounds)
+        """
+
+        self.percentile = percentile
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.reset()
+
+    def reset(self):
+        """ Forget all values """
+
+        self.key = None
+        self.count = 0
+        self.vmin, self.vmax = None, None
+        self.sample = np.empty(0)
+
+    def update(self, values, key = None, append : bool = False):
+        """
+        Update and return the bounds (vmin, vmax) of values.
+
+        Parameters
+        ----------
+        values :
+            Values to take into account
+        key :
+            Signature of values (None if unknown, see `Transform.signature`)
+        append :
+            Whether values only grow by appending
+        """
+
+        if key is not None and key == self.key:
+            return self.vmin, self.vmax
+        values = np.asanyarray(values).reshape(-1)
+        if not append or len(values) < self.count:
+            self.reset()
+        start, self.count, self.key = self.count, len(values), key
+        values = values[start:]
+        if not len(values):
+            return self.vmin, self.vmax
+
+        if self.percentile is None:
+            vmin, vmax = np.nanmin(values), np.nanmax(values)
+            if self.vmin is not None:
+                vmin, vmax = min(vmin, self.vmin), max(vmax, self.vmax)
+        else:
+            self._sample(values, start)
+            vmin, vmax = np.nanpercentile(self.sample, [self.percentile,
+                                                        100 - self.percentile])
+        self.vmin, self.vmax = vmin, vmax
+        return vmin, vmax
+
+    def _sample(self, values, start):
+        """ Update the reservoir sample with values (starting at index start) """
+
+        if start == 0:
+            # Uniform sample (with replacement) of all the values
+            if len(values) > self.size:
+                values = values[self.rng.integers(0, len(values), self.size)]
+            self.sample = np.array(values, dtype=np.float64)
+            return
+
+        fill = values[:max(0, self.size - len(self.sample))]
+        if len(fill):
+            self.sample = np.concatenate([self.sample, fill])
+            values, start = values[len(fill):], start + len(fill)
+        if len(values):
+            # Value at index i replaces a random item of the sample
+            # with probability size/(i+1)
+            slots = self.rng.random(len(values)) * np.arange(start + 1, start + len(values) + 1)
+            slots = slots.astype(np.int64)
+            keep = np.flatnonzero(slots < self.size)[::-1]
+            # The last value replacing a given item wins
+            slots, first = np.unique(slots[keep], return_index=True)
+            self.sample[slots] = values[keep[first]]
+
 
 class Colormap(Transform):
     """
@@ -14,7 +160,12 @@ class Colormap(Transform):
     def __init__(self,
                  colormap : str = None,
                  vmin : float = None,
-                 vmax : float = None):
+                 vmax : float = None,
+                 resolution : int = None,
+                 dtype : str = "float32",
+                 norm : str = "minmax",
+                 percentile : float = 1.0,
+                 append : bool = False):
         """
         Colormap transform allows to map a scalar to a color
 
@@ -32,11 +183,41 @@ class Colormap(Transform):
 
         vmax :
             Maximum value or None for dynamic maximum
+
+        resolution :
+            Number of colors of the colormap lookup table (default to
+            the number of colors of a listed colormap, 256 otherwise)
+
+        dtype :
+            Type of colors, "float32" (in [0,1]) or "uint8" (in
+            [0,255], 4 times smaller)
+
+        norm :
+            How dynamic bounds are computed, "minmax" (minimum and
+            maximum values) or "percentile" (percentiles estimated
+            from a sample of values, robust to outliers)
+
+        percentile :
+            Percentage of values clipped at both ends ("percentile")
+
+        append :
+            Whether values only grow by appending, such that dynamic
+            bounds are only updated with new values
         """
         Transform.__init__(self, __no_command__ = True)
+        if dtype not in ("float32", "uint8"):
+            raise ValueError(f"Unknown colormap dtype ({dtype})")
+        if norm not in ("minmax", "percentile"):
+            raise ValueError(f"Unknown colormap norm ({norm})")
         self._colormap = colormap
         self._vmin = vmin
         self._vmax = vmax
+        self._resolution = resolution
+        self._dtype = dtype
+        self._norm = norm
+        self._percentile = percentile
+        self._append = append
+        self._bounds = Bounds(percentile if norm == "percentile" else None)
 
     @command()
     def set_colormap(self, colormap : str ):
@@ -52,7 +233,8 @@ class Colormap(Transform):
         colormap:
             Name of the colormap
         """
-        pass
+
+        self._colormap = colormap
 
     def copy(self):
         """
@@ -63,6 +245,12 @@ class Colormap(Transform):
         transform._colormap = self._colormap
         transform._vmin = self._vmin
         transform._vmax = self._vmax
+        transform._resolution = self._resolution
+        transform._dtype = self._dtype
+        transform._norm = self._norm
+        transform._percentile = self._percentile
+        transform._append = self._append
+        transform._bounds = Bounds(self._bounds.percentile)
         return transform
 
 
@@ -71,14 +259,33 @@ class Colormap(Transform):
         Evaluate the transform using given buffers
         """
 
-        import matplotlib as mpl
-        import matplotlib.pyplot as plt
-
         if self._next:
-            value = self._next.evaluate(buffers)
+            key = self._next.signature(buffers)
+            value = self._next.evaluate_cached(buffers)
         else:
+            key = signature(self._buffer, buffers)
             value = self._buffer
-        cmap = plt.get_cmap(self._colormap)
-        norm = mpl.colors.Normalize(vmin=self._vmin or value.min(),
-                                    vmax=self._vmax or value.max())
-        return cmap(norm(value))
+        value = np.asanyarray(value)
+        vmin, vmax = self._vmin, self._vmax
+        if vmin is None or vmax is None:
+            bounds = self._bounds.update(value, key, self._append)
+            vmin = bounds[0] if vmin is None else vmin
+            vmax = bounds[1] if vmax is None else vmax
+
+        # Normalized values are scaled to lookup table indices
+        # (values out of range are clipped, nan are invalid)
+        colors = lut(self._colormap, self._resolution, self._dtype)
+        count = len(colors) - 1
+        dtype = np.float32 if value.dtype == np.float32 else np.float64
+        index = np.asarray(np.subtract(value, vmin, dtype=dtype))
+        if vmax != vmin:
+            index /= vmax - vmin
+        else:
+            index[...] = 0
+        index *= count
+        invalid = np.isnan(index)
+        index[invalid] = 0
+        np.clip(index, 0, count - 1, out=index)
+        index = index.astype(np.intp)
+        index[invalid] = count
+        return colors.take(index, axis=0)
@@ -2,11 +2,68 @@
 # Authors: Nicolas P .Rougier <nicolas.rougier@gmail.com>
 # License: BSD 3 clause
 import numpy as np
-from gsp import glm
 from gsp.core import Buffer, Color
 from gsp.transform import Transform
+from gsp.transform.cache import Cache
+from gsp.transform.transform import signature
 from gsp.io.command import command
 
+normals = Cache()
+"""
+Cache of face (or vertex) normals, indexed by geometry (buffer or
+transform) such that lights sharing the same geometry share normals
+"""
+
+def sRGB_to_RGB(color):
+    """ Convert sRGB color components to linear RGB """
+
+    color = np.asarray(color, dtype=np.float64)
+    return np.where(color <= 0.04045, color/12.92, ((color + 0.055)/1.055)**2.4)
+
+def RGB_to_sRGB(color):
+    """ Convert linear RGB color components to sRGB """
+
+    color = np.asarray(color, dtype=np.float64)
+    return np.where(color <= 0.0031308, 12.92*color, 1.055*color**(1/2.4) - 0.055)
+
+def _normalize(V):
+    """ Normalize vectors V (along last axis) """
+
+    return V / (1e-16 + np.sqrt((V**2).sum(axis=-1)))[..., np.newaxis]
+
+def face_normals(F, smooth = False):
+    """
+    Compute the normals of faces F (n x 3 vertices).
+
+    Parameters
+    ----------
+    F :
+        Faces (n x 3 x 3)
+    smooth :
+        Whether to compute per vertex normals (average of the normals
+        of the faces sharing a vertex, weighted by face area)
+
+    Returns
+    -------
+
+    Face normals (n x 3) or (vertex normals (m x 3), face indices
+    (n x 3)) when smooth is True.
+    """
+
+    F = np.asarray(F, dtype=np.float64).reshape(-1, 3, 3)
+    N = np.cross(F[:,1] - F[:,0], F[:,2] - F[:,0])
+    if not smooth:
+        return _normalize(N).astype(np.float32)
+
+    # Faces vertices are indexed by unique vertices and the normals
+    # of faces are accumulated on their vertices (scatter-add)
+    V, I = np.unique(F.reshape(-1, 3), axis=0, return_inverse=True)
+    I = I.reshape(-1)
+    N = np.repeat(N, 3, axis=0)
+    VN = np.stack([np.bincount(I, N[:,i], len(V)) for i in range(3)], axis=-1)
+    dtype = np.int32 if len(V) < 2**31 else np.int64
+    return _normalize(VN).astype(np.float32), I.reshape(-1, 3).astype(dtype)
+
 
 class Light(Transform):
     """
@@ -15,39 +72,47 @@ class Light(Transform):
 
     @command("transform.Light")
     def __init__(self,
-                 direction : list         = (1,1,1),
-                 ambient_color : Color    = (1,0,0,0.2),
-                 diffuse_color : Color    = (1,1,1,0.8),
-                 specular_color : Color   = (1,1,1,0)):
+                 direction : list | tuple    = (1,1,1),
+                 ambient_color : Color       = (1,0,0,0.2),
+                 diffuse_color : Color | list = (1,1,1,0.8),
+                 specular_color : Color | list = (1,1,1,0),
+                 smooth : bool = False):
         """
         Light transform allows to modify faces color according to light parameters
 
         Parameters
         ----------
         direction:
-            Direction of the light
+            Direction toward the light, or list of directions toward
+            several directional lights
         ambient_color:
             Ambient color, alpha component being strength
         diffuse_color:
-            Diffuse color, alpha component being strength
+            Diffuse color (or list of colors, one per light), alpha
+            component being strength
         specular_color:
-            Specular color, alpha component being shininess
+            Specular color (or list of colors, one per light), alpha
+            component being shininess
+        smooth:
+            Whether to use smooth (per vertex) normals instead of
+            face normals
         """
 
         Transform.__init__(self, __no_command__ = True)
-        self._direction = np.asanyarray(direction)
+        self._direction = _normalize(np.array(direction, dtype=np.float64).reshape(-1,3))
 
-        self._ambient_color = np.asanyarray(ambient_color)
-        self._ambient_strength = self._ambient_color[3]
-        self._ambient_color[3] = 1
+        ambient_color = np.array(ambient_color, dtype=np.float64)
+        self._ambient_color = ambient_color[:3]
+        self._ambient_strength = ambient_color[3]
 
-        self._diffuse_color = np.asanyarray(diffuse_color)
-        self._diffuse_strength = self._diffuse_color[3]
-        self._diffuse_color[3] = 1
+        diffuse_color = np.array(diffuse_color, dtype=np.float64).reshape(-1,4)
+        self._diffuse_color = diffuse_color[:,:3]
+        self._diffuse_strength = diffuse_color[:,3]
 
-        self._specular_color = np.asanyarray(specular_color)
-        self._shininess = self._specular_color[3]
-        self._specular_color[3] = 1
+        specular_color = np.array(specular_color, dtype=np.float64).reshape(-1,4)
+        self._specular_color = specular_color[:,:3]
+        self._shininess = specular_color[:,3]
+        self._smooth = smooth
 
     def copy(self):
         transform = Transform.copy(self)
@@ -58,39 +123,64 @@ class Light(Transform):
         transform._diffuse_strength = self._diffuse_strength
         transform._specular_color = self._specular_color
         transform._shininess = self._shininess
+        transform._smooth = self._smooth
         return transform
 
-    def evaluate(self, buffers):
+    def normals(self, buffers):
+        """
+        Return the normals of the faces (see `face_normals`), that
+        are only computed again when the faces have changed.
+        """
 
         if self._next:
-            F = self._next.evaluate(buffers)
+            geometry, key = self._next, self._next.signature(buffers)
         else:
-            F = self._buffer
-
-        # Faces center
-        C = F.mean(axis=1)
+            geometry, key = self._buffer, signature(self._buffer, buffers)
+        if key is not None:
+            key = key, self._smooth
+            value = normals.get(geometry, key)
+            if value is not None:
+                return value
 
-        # Faces normal
-        N = glm.normalize(np.cross(F[:,2]-F[:,0], F[:,1]-F[:,0]))
+        if self._next:
+            F = self._next.evaluate_cached(buffers)
+        else:
+            F = self._buffer
+        value = face_normals(F, self._smooth)
+        if key is not None:
+            normals.put(geometry, key, value)
+        return value
 
-        # Relative light direction
-        D = glm.normalize(C - self._direction)
+    def evaluate(self, buffers):
 
-        # Diffuse term
-        diffuse = glm.clamp((N*D).sum(-1).reshape(-1,1))
+        # Diffuse term (all lights at once)
+        if self._smooth:
+            N, I = self.normals(buffers)
+        else:
+            N, I = self.normals(buffers), None
+        diffuse = np.clip(N @ self._direction.T, 0, 1)
 
         # Specular term
-        specular = 0
-        if self._shininess:
-            specular = np.power(diffuse, self._shininess)
-
-        ambient_color = glm.sRGBA_to_RGBA(self._ambient_color)
-        diffuse_color = glm.sRGBA_to_RGBA(self._diffuse_color)
-        specular_color = glm.sRGBA_to_RGBA(self._specular_color)
-        color = (             ambient_color * self._ambient_strength
-                 + diffuse *  diffuse_color * self._diffuse_strength
-                 + specular * specular_color)
+        shininess = self._shininess
+        if shininess.any():
+            specular = np.where(shininess > 0, diffuse**shininess, 0)
+        else:
+            specular = None
+
+        # Vertex terms are averaged over faces
+        if I is not None:
+            diffuse = diffuse[I].mean(axis=1)
+            if specular is not None:
+                specular = specular[I].mean(axis=1)
+
+        ambient_color = sRGB_to_RGB(self._ambient_color)
+        diffuse_color = sRGB_to_RGB(self._diffuse_color)
+        specular_color = sRGB_to_RGB(self._specular_color)
+        color = np.empty((len(diffuse), 4), dtype=np.float32)
+        rgb = ambient_color * self._ambient_strength + diffuse @ (
+              diffuse_color * self._diffuse_strength[:,np.newaxis])
+        if specular is not None:
+            rgb += specular @ specular_color
+        color[:,:3] = np.minimum(1, RGB_to_sRGB(rgb))
         color[:,3] = 1
-        color = glm.RGBA_to_sRGBA(color)
-
-        return np.minimum(1, color)
+        return color
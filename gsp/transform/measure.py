@@ -75,7 +75,7 @@ class Measure(Transform):
             width, height = variables["size"]
 
         if self._next:
-            value = self._next.evaluate(variables)
+            value = self._next.evaluate_cached(variables)
         elif self._buffer is not None:
             value = self._buffer
         else:
@@ -95,6 +95,30 @@ class Measure(Transform):
 
         return scale * value
 
+    def signature(self, variables):
+        """
+        Measures depend on the dpi and on the size (and limits) of
+        the canvas or viewport (see `Transform.signature`)
+        """
+
+        key = Transform.signature(self, variables)
+        if key is None:
+            return None
+        if "dpi" in variables.keys():
+            inputs = variables["dpi"],
+        elif "viewport" in variables.keys():
+            viewport = variables["viewport"]
+            inputs = (viewport._canvas._dpi, tuple(viewport.size),
+                      tuple(viewport.xlim), tuple(viewport.ylim))
+        elif "canvas" in variables.keys():
+            canvas = variables["canvas"]
+            inputs = canvas._dpi, tuple(canvas.size)
+        else:
+            return None
+        if "size" in variables.keys():
+            inputs += tuple(variables["size"]),
+        return key, inputs
+
     def __mul__(self, other):
         if isinstance(other, (int,float,tuple,np.ndarray)):
             return self(other)
@@ -2,7 +2,7 @@
 # Authors: Nicolas P .Rougier <nicolas.rougier@gmail.com>
 # License: BSD 3 clause
 from gsp.core import Buffer
-from . transform import Transform
+from . transform import Transform, signature
 from gsp.io.command import command
 
 class Operator(Transform):
@@ -115,24 +115,31 @@ class Operator(Transform):
         if isinstance(self._right, Transform):
             transform.set_right(self._right.copy())
         else:
-            transform.set_left(self._left)
+            transform.set_right(self._right)
 
         return transform
 
     def evaluate(self, variables):
 
         if isinstance(self._left, Transform):
-            left = self._left.evaluate(variables)
+            left = self._left.evaluate_cached(variables)
         else:
             left = self._left
 
         if isinstance(self._right, Transform):
-            right = self._right.evaluate(variables)
+            right = self._right.evaluate_cached(variables)
         else:
             right = self._right
 
         return left, right
 
+    def signature(self, variables):
+        left = signature(self._left, variables)
+        right = signature(self._right, variables)
+        if left is None or right is None:
+            return None
+        return self._operator, left, right
+
     def __repr__(self):
 
         if self._base:
@@ -43,6 +43,14 @@ class Out(Transform):
         return transform
 
 
+    def signature(self, variables : dict):
+        """
+        Out variables are updated in place at each rendering and their
+        evaluation hence cannot be cached.
+        """
+
+        return None
+
     def evaluate(self, variables : dict):
         """
         Evaluate the transform
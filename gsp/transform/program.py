@@ -0,0 +1,220 @@
+# Package: Graphic Server Protocol
+# Authors: Nicolas P .Rougier <nicolas.rougier@gmail.com>
+# License: BSD 3 clause
+"""
+Compilation of transforms. A transform tree (e.g. `(2*P+1)*(2*P+1)`)
+is flattened into a linear program whose constant (scalar) subtrees
+are folded and whose common subexpressions are evaluated only once.
+Arithmetic is computed in scratch buffers that are allocated on first
+run and reused (using `out=`) as long as operands keep the same shape
+and dtype. Small trees (e.g. `[-1,-1,0] + 10*pixel`) that do not
+benefit from any of these are evaluated directly after the first run:
+
+```python
+program = transform.compile()
+value = program(variables) # same as transform.evaluate(variables)
+```
+"""
+import operator
+import numpy as np
+from gsp.core import Buffer
+from . transform import Transform
+from . operator import Add, Sub, Mul, Div
+
+_operators = { Add : (operator.add, np.add),
+               Sub : (operator.sub, np.subtract),
+               Mul : (operator.mul, np.multiply),
+               Div : (operator.truediv, np.true_divide) }
+""" Python operator and ufunc of arithmetic transforms """
+
+_scalars = (bool, int, float, complex)
+""" Python scalar types (whose dtype depends on the other operand) """
+
+
+def _signature(value):
+    """
+    Return the (type, dtype, shape) of a value that can be used as
+    a ufunc operand with a scratch output or None.
+    """
+
+    vtype = type(value)
+    if vtype is np.ndarray or isinstance(value, np.generic):
+        return vtype, value.dtype, value.shape
+    elif vtype in _scalars:
+        return vtype, None, ()
+    return None
+
+
+def _key(node):
+    """
+    Return a structural key of a transform tree node such that nodes
+    with the same key evaluate to the same value. Python scalars are
+    keyed by value, transforms by their parameters and other values
+    (buffers, arrays, lists) by identity.
+    """
+
+    if isinstance(node, Transform):
+        if type(node) in _operators:
+            return type(node), _key(node._left), _key(node._right)
+        attributes = []
+        for name, value in sorted(vars(node).items()):
+            if name in ("_id", "_base", "_next", "_buffer"):
+                continue
+            if not (value is None or type(value) in _scalars + (str,)):
+                value = id(value)
+            attributes.append((name, value))
+        return (type(node), _key(node._next), _key(node._buffer),
+                tuple(attributes))
+    elif node is None or type(node) in _scalars:
+        return type(node), node
+    return id(node)
+
+
+class Program:
+    """
+    Compiled (linear) form of a transform (see `Transform.compile`).
+
+    A program owns scratch buffers and is hence not reentrant. It
+    must be compiled again when the transform is modified (see
+    `compiles`).
+    """
+
+    def __init__(self, transform : Transform):
+        """
+        Compile a transform.
+
+        Parameters
+        ----------
+        transform : Transform
+            Transform to compile
+        """
+
+        self.transform = transform
+        self.constants = []
+        self.code = []
+        self.saved = 0
+        self.direct = False
+        self._slots = {}
+        # Nodes are kept alive such that identity keys stay valid
+        self._nodes = []
+        self.result = self._emit(transform)
+        self.key = _key(transform)
+        self._scratch = [None] * len(self.code)
+        del self._slots
+
+    def compiles(self, transform : Transform):
+        """
+        Return whether the program is the compiled form of transform
+        in its current state (same tree and parameters).
+        """
+
+        return transform is self.transform and _key(transform) == self.key
+
+    def _constant(self, value):
+        """ Store a constant value and return its slot """
+
+        self.constants.append(value)
+        return len(self.constants) - 1
+
+    def _emit(self, node):
+        """
+        Emit the instructions evaluating node and return the slot of
+        its value (negative slots are constants).
+        """
+
+        key = _key(node)
+        try:
+            slot = self._slots[key]
+            self.saved += 1
+            return slot
+        except KeyError:
+            pass
+        self._nodes.append(node)
+
+        if type(node) in _operators:
+            function, ufunc = _operators[type(node)]
+            left, right = self._emit(node._left), self._emit(node._right)
+            # Only scalars are folded since arrays and buffers may be
+            # modified in place
+            if (left < 0 and right < 0 and
+                type(self.constants[~left]) in _scalars and
+                type(self.constants[~right]) in _scalars):
+                value = function(self.constants[~left], self.constants[~right])
+                slot = ~self._constant(value)
+                self.saved += 1
+            else:
+                self.code.append((function, ufunc, left, right))
+                slot = len(self.code) - 1
+        elif isinstance(node, Transform):
+            self.code.append((node.evaluate_cached, None, None, None))
+            slot = len(self.code) - 1
+        elif isinstance(node, Buffer) or type(node) in _scalars or node is None:
+            slot = ~self._constant(node)
+        else:
+            slot = ~self._constant(np.asanyarray(node))
+        self._slots[key] = slot
+        return slot
+
+    def __len__(self):
+        """ Number of instructions """
+
+        return len(self.code)
+
+    def __call__(self, variables : dict):
+        """
+        Run the program
+
+        Parameters
+        ----------
+        variables :
+            Dictionary of variables (see `Transform.evaluate`)
+        """
+
+        if self.direct:
+            return self.transform.evaluate(variables)
+        if self.result < 0:
+            value = self.constants[~self.result]
+            return value.copy() if isinstance(value, np.ndarray) else value
+
+        constants = self.constants
+        scratch = self._scratch
+        values = [None] * len(self.code)
+        last = len(self.code) - 1
+        for index, (function, ufunc, left, right) in enumerate(self.code):
+            if ufunc is None:
+                values[index] = function(variables)
+                continue
+            left = constants[~left] if left < 0 else values[left]
+            right = constants[~right] if right < 0 else values[right]
+
+            # Intermediate values are written to scratch buffers but
+            # the result is a new array (that may be kept by the caller)
+            if index == last:
+                values[index] = function(left, right)
+                continue
+            signature = _signature(left), _signature(right)
+            if None in signature:
+                values[index] = function(left, right)
+            elif scratch[index] is not None and scratch[index][0] == signature:
+                values[index] = ufunc(left, right, out=scratch[index][1])
+            else:
+                values[index] = function(left, right)
+                if type(values[index]) is np.ndarray and values[index].ndim:
+                    scratch[index] = signature, values[index]
+
+        # Programs that neither save evaluations nor intermediate
+        # arrays are slower than a direct evaluation
+        if not self.saved and all(item is None for item in scratch):
+            self.direct = True
+        return values[self.result]
+
+    def __str__(self):
+        lines = []
+        for index, (function, ufunc, left, right) in enumerate(self.code):
+            if ufunc is None:
+                lines.append("%d: %s.evaluate_cached()" % (index, type(function.__self__).__name__))
+            else:
+                operands = ["c%d" % ~slot if slot < 0 else "%d" % slot
+                            for slot in (left, right)]
+                lines.append("%d: %s %s %s" % (index, ufunc.__name__, *operands))
+        return "\n".join(lines)
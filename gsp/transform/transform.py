@@ -2,11 +2,70 @@
 # Authors: Nicolas P .Rougier <nicolas.rougier@gmail.com>
 # License: BSD 3 clause
 from __future__ import annotations
+import weakref
 import numpy as np
 from gsp.object import Object
 from gsp.core import Buffer
 from gsp.io.command import command
 
+_scalars = (type(None), bool, int, float, complex, str)
+""" Immutable values that can be part of a signature """
+
+class _Identity:
+    """
+    Identity of an object in a signature. Unlike its id, it is never
+    equal to the identity of another object that reuses the id of a
+    collected object, since the object is weakly referenced.
+    """
+
+    __slots__ = ("ref", "id")
+
+    def __init__(self, value):
+        self.ref, self.id = weakref.ref(value), id(value)
+
+    def __eq__(self, other):
+        return (isinstance(other, _Identity) and self.id == other.id
+                and self.ref() is not None and self.ref() is other.ref())
+
+    def __hash__(self):
+        return self.id
+
+
+def _identity(value):
+    """
+    Return the identity of value or None if it cannot be weakly
+    referenced (see `_Identity`)
+    """
+
+    try:
+        return _Identity(value)
+    except TypeError:
+        return None
+
+
+def signature(value, variables : dict):
+    """
+    Return a hashable key of a transform input (see
+    `Transform.signature`) or None if it cannot be cached. Versioned
+    buffers are identified by their identity and version. Arrays and
+    unversioned buffers may be modified in place and cannot be
+    cached.
+    """
+
+    if isinstance(value, Transform):
+        return value.signature(variables)
+    elif type(value) in _scalars:
+        return type(value), value
+    elif type(value) is tuple:
+        if all(type(item) in _scalars for item in value):
+            return tuple, value
+        return None
+    version = getattr(value, "version", None)
+    if isinstance(value, Buffer) and version is not None:
+        return _identity(value), version
+    return None
+
+
 class Transform(Object):
 
     @command("transform.Transform")
@@ -89,6 +148,71 @@ class Transform(Object):
 
         raise NotImplementedError("Generic transforms cannot be evaluated")
 
+    def signature(self, variables : dict):
+        """
+        Return a hashable key of everything the evaluation of the
+        transform depends on (bound buffer or next transform and
+        parameters) or None if it cannot be cached.
+
+        Parameters
+        ----------
+        variables : dict
+            Variables the transform is evaluated with
+        """
+
+        if self._next:
+            key = self._next.signature(variables)
+        else:
+            key = signature(self._buffer, variables)
+        if key is None:
+            return None
+        parameters = []
+        for name, value in vars(self).items():
+            if name in ("_id", "_base", "_next", "_buffer"):
+                continue
+            if isinstance(value, (np.generic, np.dtype)):
+                value = type(value), value
+            elif type(value) not in _scalars:
+                # Other parameters (e.g. light colors) are never
+                # modified in place
+                value = _identity(value)
+                if value is None:
+                    return None
+            parameters.append(value)
+        return key, tuple(parameters)
+
+    def evaluate_cached(self, variables : dict):
+        """
+        Evaluate the transform unless its last result is still valid
+        (see `signature` and `gsp.transform.cache`). The result may be
+        shared and must not be modified.
+
+        Parameters
+        ----------
+        variables : dict
+            Variables the transform is evaluated with
+        """
+
+        from gsp.transform.cache import cache
+
+        key = self.signature(variables)
+        if key is None:
+            return self.evaluate(variables)
+        value = cache.get(self, key)
+        if value is None:
+            value = self.evaluate(variables)
+            cache.put(self, key, value)
+        return value
+
+    def compile(self):
+        """
+        Compile the transform into a program that evaluates it
+        (see `gsp.transform.program`)
+        """
+
+        from gsp.transform.program import Program
+        return Program(self)
+
     @property
     def base(self):
         """
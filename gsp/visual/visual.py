@@ -26,6 +26,7 @@ class Visual(Object):
         self._view = np.eye(4)
         self._proj = np.eye(4)
         self._transform = np.eye(4)
+        self._cache = {}
 
     def set_variable(self, name, value):
         """
@@ -74,7 +75,12 @@ class Visual(Object):
 
         value = self.get_variable(name)
         if isinstance(value, Transform):
-            value = value.evaluate(self._in_variables | self._out_variables)
+            # Transforms are compiled again only when modified (see
+            # Transform.compile)
+            program = self._cache.get(name)
+            if program is None or not program.compiles(value):
+                program = self._cache[name] = value.compile()
+            value = program(self._in_variables | self._out_variables)
         elif isinstance(value, (Buffer, np.ndarray)):
             value = np.asanyarray(value)
         elif isinstance(value, (List, list)):
@@ -64,15 +64,24 @@ def ndarray_to_Buffer(obj):
 
 @register("tracked", "Buffer")
 def tracked_to_Buffer(obj):
+    # Tracked arrays resulting from a computation have no tracker
+    if obj._tracker is None:
+        return ndarray_to_Buffer(obj)
     return obj._tracker.gsp_buffer
 
 
 class Tracker:
+    """
+    Tracker that mirrors a tracked array into a GSP Buffer. The array
+    memory is used as the buffer data at creation and any subsequent
+    modification is recorded as a `Buffer.set_data` command restricted
+    to the modified (dirty) bytes.
+    """
+
     def __init__(self, ndarray):
         if ndarray is not None:
             self.ndarray = ndarray
             self.gsp_buffer = Buffer(len(ndarray), ndarray.dtype, ndarray.data)
-            self.gsp_buffer.set_data(0, ndarray.tobytes())
 
     def set_data(self, offset, bytes):
         self.gsp_buffer.set_data(offset, bytes)
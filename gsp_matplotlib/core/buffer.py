@@ -25,21 +25,61 @@ class Buffer(core.Buffer):
         else:
             self._data = data
         self._array = None
+        self._version = 0
 
     @command()
     def set_data(self, offset : int,
                        data : memoryview | bytes):
-        # Be careful with set_data when the underlying data is already tracked
-        # buffer = np.asanyarray(self).view(np.ubyte)
-        # buffer[offset:offset+len(data)] = np.frombuffer(data, np.ubyte)
-        pass
 
-    def __array__(self):
+        if isinstance(data, str):
+            import base64
+            data = base64.b64decode(data)
+
+        buffer = self._writable().reshape(-1).view(np.ubyte)
+        if hasattr(data, "__array__"):
+            # Lazy data (e.g. sidecar file or compressed data)
+            data = np.ascontiguousarray(data).reshape(-1).view(np.ubyte)
+        else:
+            data = np.frombuffer(data, np.ubyte)
+        if offset < 0 or offset + data.nbytes > buffer.nbytes:
+            raise ValueError(
+                f"Data ({data.nbytes} bytes at offset {offset}) does not fit in buffer ({buffer.nbytes} bytes)")
+
+        # When the buffer wraps the memory of a tracked array, data
+        # is usually a view on the very bytes to update.
+        target = buffer[offset:offset+data.nbytes]
+        if (target.__array_interface__["data"][0] != data.__array_interface__["data"][0]
+            or target.shape != data.shape or target.strides != data.strides):
+            target[...] = data
+        self._version += 1
+
+    @property
+    def version(self):
+        """ Number of times the buffer content has been updated """
+
+        return self._version
+
+    def _writable(self):
+        """ Return the underlying array, made writable (once) if necessary """
+
+        array = np.asarray(self)
+        if not array.flags.writeable:
+            # Read-only data (bytes, read-only mapping) is copied once
+            # such that subsequent updates are made in place.
+            self._array = array = array.copy()
+        return array
+
+    def __array__(self, dtype=None, copy=None):
         if self._array is None:
-            if self._data is not None:
-                self._array = np.frombuffer(self._data, self._dtype)
-            else:
+            if self._data is None:
                 self._array = np.empty(self._count, self._dtype)
+            elif hasattr(self._data, "__array__"):
+                # Lazy data (e.g. sidecar file) is resolved on first access
+                self._array = np.asarray(self._data).view(self._dtype)
+            else:
+                self._array = np.frombuffer(self._data, self._dtype)
+        if dtype is not None and dtype != self._array.dtype:
+            return self._array.astype(dtype)
         return self._array
 
     def __repr__(self):
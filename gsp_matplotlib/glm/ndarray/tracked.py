@@ -48,9 +48,14 @@ class tracked(np.ndarray):
         else:
             self._extents = self._compute_extents(obj)
         self._dirty = self._extents
-        self._tracker = getattr(obj, '_tracker', None)
-        if self._tracker is None and self.__tracker_class__ is not None:
-            self._tracker = self.__tracker_class__(obj)
+        if isinstance(obj, tracked) and not np.may_share_memory(self, obj):
+            # Result of a computation (e.g. ufunc) that does not share
+            # memory with obj and must not be signaled to its tracker
+            self._tracker = None
+        else:
+            self._tracker = getattr(obj, '_tracker', None)
+            if self._tracker is None and self.__tracker_class__ is not None:
+                self._tracker = self.__tracker_class__(obj)
 
     def clear(self):
         """ Clear dirty region"""
@@ -83,6 +88,21 @@ class tracked(np.ndarray):
                 stop = max(self._dirty[1], stop)
                 self._dirty = start, stop
 
+    def _notify(self):
+        """ Signal the dirty region to the tracker and clear it """
+
+        if not self._tracker:
+            return
+        base = self
+        while base.base is not None and isinstance(base.base, tracked):
+            base = base.base
+        if base._dirty is None:
+            return
+        start, stop = int(base._dirty[0]), int(base._dirty[1])
+        data = base.view(np.ubyte).ravel()
+        base._tracker.set_data(start, data[start:stop].tobytes())
+        base.clear()
+
     def _compute_extents(self, Z):
         """Compute extents (start, stop) in bytes in the base array"""
 
@@ -138,22 +158,16 @@ class tracked(np.ndarray):
                 any(isinstance(k, (list,np.ndarray)) for k in key)))):
             raise NotImplementedError("Fancy indexing not supported")
         else:
+            # Assignment of a view to itself (e.g. Z[a:b] += 1, where the
+            # in-place operator has already signaled the change)
+            if (isinstance(value, np.ndarray) and value.dtype == Z.dtype and
+                value.shape == Z.shape and value.strides == Z.strides and
+                value.__array_interface__['data'][0] == Z.__array_interface__['data'][0]):
+                return
             Z._extents = self._compute_extents(Z)
             self._update(Z._extents[0], Z._extents[1])
         np.ndarray.__setitem__(self, key, value)
-
-        if self._tracker:
-            base = self
-            while base.base is not None and isinstance(base.base, tracked):
-                base = base.base
-            data = base.view(np.ubyte).ravel()
-            start, stop = self._dirty
-            if base is not self:
-                base._tracker.set_data(start, data[start:stop].tobytes())
-                base.clear()
-            else:
-                self._tracker.set_data(start, data[start:stop].tobytes())
-                self.clear()
+        self._notify()
 
     def __getslice__(self, start, stop):
         return self.__getitem__(slice(start, stop))
@@ -163,16 +177,24 @@ class tracked(np.ndarray):
 
     def __iadd__(self, other):
         self._update(self._extents[0], self._extents[1])
-        return np.ndarray.__iadd__(self, other)
+        result = np.ndarray.__iadd__(self, other)
+        self._notify()
+        return result
 
     def __isub__(self, other):
         self._update(self._extents[0], self._extents[1])
-        return np.ndarray.__isub__(self, other)
+        result = np.ndarray.__isub__(self, other)
+        self._notify()
+        return result
 
     def __imul__(self, other):
         self._update(self._extents[0], self._extents[1])
-        return np.ndarray.__imul__(self, other)
+        result = np.ndarray.__imul__(self, other)
+        self._notify()
+        return result
 
-    def __idiv__(self, other):
+    def __itruediv__(self, other):
         self._update(self._extents[0], self._extents[1])
-        return np.ndarray.__idiv__(self, other)
+        result = np.ndarray.__itruediv__(self, other)
+        self._notify()
+        return result
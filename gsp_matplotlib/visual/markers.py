@@ -5,13 +5,14 @@
 import numpy as np
 from gsp_matplotlib import glm
 from gsp import visual
+from . visual import Visual
 from gsp.io.command import command
 from gsp.transform import Transform
 from gsp.core import Viewport, Buffer, Color, Marker, Vec3
 import matplotlib as mpl
 
 
-class Markers(visual.Markers):
+class Markers(Visual, visual.Markers):
 
     __doc__ = visual.Markers.__doc__
 
@@ -87,9 +88,7 @@ class Markers(visual.Markers):
 
             # This is necessary for measure transforms that need to be
             # kept up to date with canvas size
-            canvas = viewport._canvas._figure.canvas
-            canvas.mpl_connect('resize_event',
-                               lambda event: self.render(viewport))
+            self._connect(viewport)
 
         # If render has been called without model/view/proj, we don't
         # render Such call is only used to declare that this visual is
@@ -5,13 +5,14 @@
 import numpy as np
 from gsp_matplotlib import glm
 from gsp import visual
+from . visual import Visual
 from gsp.io.command import command
 from gsp.transform import Transform
 from gsp.core import Viewport, List, Buffer, Color, Measure, LineCap, LineStyle, LineJoin
 
 from matplotlib.collections import LineCollection
 
-class Paths(visual.Paths):
+class Paths(Visual, visual.Paths):
 
     __doc__ = visual.Paths.__doc__
 
@@ -60,9 +61,7 @@ class Paths(visual.Paths):
 
             # This is necessary for measure transforms that need to be
             # kept up to date with canvas size
-            canvas = viewport._canvas._figure.canvas
-            canvas.mpl_connect('resize_event',
-                               lambda event: self.render(viewport))
+            self._connect(viewport)
 
         # If render has been called without model/view/proj, we don't
         # render Such call is only used to declare that this visual is
@@ -5,12 +5,13 @@
 import numpy as np
 from gsp_matplotlib import glm
 from gsp import visual
+from . visual import Visual
 from gsp.io.command import command
 from gsp.transform import Transform
 from gsp.core import Viewport, Buffer, Color
 
 
-class Points(visual.Points):
+class Points(Visual, visual.Points):
 
     __doc__ = visual.Points.__doc__
 
@@ -47,9 +48,7 @@ class Points(visual.Points):
 
             # This is necessary for measure transforms that need to be
             # kept up to date with canvas size
-            canvas = viewport._canvas._figure.canvas
-            canvas.mpl_connect('resize_event',
-                               lambda event: self.render(viewport))
+            self._connect(viewport)
 
         # If render has been called without model/view/proj, we don't
         # render Such call is only used to declare that this visual is
@@ -5,13 +5,14 @@
 import numpy as np
 from gsp_matplotlib import glm
 from gsp import visual
+from . visual import Visual
 from gsp.io.command import command
 from gsp.transform import Transform
 from gsp.core import Viewport, List, Buffer, Color, Measure, LineStyle, LineJoin
 
 from matplotlib.collections import PolyCollection
 
-class Polygons(visual.Polygons):
+class Polygons(Visual, visual.Polygons):
 
     __doc__ = visual.Polygons.__doc__
 
@@ -56,9 +57,7 @@ class Polygons(visual.Polygons):
 
             # This is necessary for measure transforms that need to be
             # kept up to date with canvas size
-            canvas = viewport._canvas._figure.canvas
-            canvas.mpl_connect('resize_event',
-                               lambda event: self.render(viewport))
+            self._connect(viewport)
 
         # If render has been called without model/view/proj, we don't
         # render Such call is only used to declare that this visual is
@@ -5,6 +5,7 @@
 import numpy as np
 from gsp_matplotlib import glm
 from gsp import visual
+from . visual import Visual
 from gsp.io.command import command
 from gsp.transform import Transform
 from gsp.core import Viewport, Buffer, Color, LineCap
@@ -12,7 +13,7 @@ from gsp.core import Viewport, Buffer, Color, LineCap
 import matplotlib.patheffects as path_effects
 from matplotlib.collections import LineCollection
 
-class Segments(visual.Segments):
+class Segments(Visual, visual.Segments):
 
     __doc__ = visual.Segments.__doc__
 
@@ -46,9 +47,7 @@ class Segments(visual.Segments):
 
             # This is necessary for measure transforms that need to be
             # kept up to date with canvas size
-            canvas = viewport._canvas._figure.canvas
-            canvas.mpl_connect('resize_event',
-                               lambda event: self.render(viewport))
+            self._connect(viewport)
 
         # If render has been called without model/view/proj, we don't
         # render Such call is only used to declare that this visual is
@@ -0,0 +1,54 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@gmail.com>
+# License: BSD 3 clause
+import numpy as np
+
+
+class Visual:
+    """
+    Matplotlib specific behavior common to all visuals. It is meant
+    to be inherited before the corresponding gsp visual.
+    """
+
+    def eval_variable(self, name):
+        """
+        Evaluate and return variable *name*. Colors stored as bytes
+        (e.g. uint8 colormaps) are converted to floats as expected by
+        matplotlib.
+        """
+
+        value = super().eval_variable(name)
+        if (name.endswith("colors") and isinstance(value, np.ndarray)
+                                    and value.dtype == np.uint8):
+            value = value / 255
+        return value
+
+    def _connect(self, viewport):
+        """
+        Render the visual again when the canvas of viewport is
+        resized. The bound method is only weakly referenced by
+        matplotlib such that it does not keep the visual alive.
+        """
+
+        canvas = viewport._canvas._figure.canvas
+        canvas.mpl_connect('resize_event', self._on_resize)
+
+    def _on_resize(self, event):
+        """ Render the visual on viewports whose canvas has been resized """
+
+        for viewport in list(self._viewports):
+            if viewport._canvas._figure.canvas is event.canvas:
+                self.render(viewport)
+
+    def delete(self):
+        """
+        Delete the visual and remove it from all the viewports it
+        has been rendered on.
+        """
+
+        for viewport, collection in self._viewports.items():
+            # Collection may have been added more than once to the axes
+            while collection in viewport._axes.collections:
+                collection.remove()
+        self._viewports.clear()
+        super().delete()
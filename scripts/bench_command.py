@@ -0,0 +1,95 @@
+"""
+Micro-benchmark of the @command decorator.
+
+It measures the per-call overhead of a method wrapped by the command
+decorator, compared to the same undecorated method, with command
+recording on and off, as well as the per-command overhead of
+replaying a command queue.
+"""
+
+import os
+import sys
+import timeit
+import argparse
+
+__dirname__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(__dirname__, ".."))
+
+import numpy as np
+from gsp import Object
+from gsp.io.command import command, record, CommandQueue, Dispatcher
+
+
+class Plain(Object):
+    def __init__(self, value : int):
+        Object.__init__(self)
+
+    def set_value(self, value : int, scale : float = 1.0):
+        self.value = value
+
+class Decorated(Object):
+    @command()
+    def __init__(self, value : int):
+        Object.__init__(self)
+
+    @command()
+    def set_value(self, value : int, scale : float = 1.0):
+        self.value = value
+
+    @command()
+    def set_array(self, value : np.ndarray | list):
+        self.value = value
+
+
+def bench(statement, number):
+    """ Return the time (in µs) per call of the given statement """
+
+    queue = CommandQueue("active").empty()
+    times = timeit.repeat(statement, number=number, repeat=5, globals=globals())
+    queue.empty()
+    return 1e6 * min(times) / number
+
+
+def bench_replay(number):
+    """ Return the time (in µs) per command of a queue replay
+    (commands are recorded, then replayed without recording) """
+
+    queue = CommandQueue("active").empty()
+    record(True)
+    decorated = Decorated(1)
+    for i in range(number):
+        decorated.set_value(i)
+    commands = list(queue.commands)
+    record(False)
+    module = sys.modules[__name__]
+    times = timeit.repeat(lambda: Dispatcher(module).run(commands),
+                          number=1, repeat=5)
+    queue.empty()
+    return 1e6 * min(times) / number
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--number", type=int, default=100_000,
+                        help="Number of calls per measure")
+    args = parser.parse_args()
+
+    global plain, decorated, array
+    plain, decorated = Plain(1), Decorated(1)
+    array = np.zeros(10)
+
+    print(f"{'Call':<40} {'µs/call':>10}")
+    print(f"{'plain set_value(1)':<40} {bench('plain.set_value(1)', args.number):10.3f}")
+    record(True)
+    print(f"{'@command set_value(1) (recording)':<40} {bench('decorated.set_value(1)', args.number):10.3f}")
+    print(f"{'@command set_array(array) (recording)':<40} {bench('decorated.set_array(array)', args.number):10.3f}")
+    print(f"{'@command __init__(1) (recording)':<40} {bench('Decorated(1)', args.number):10.3f}")
+    record(False)
+    print(f"{'@command set_value(1) (not recording)':<40} {bench('decorated.set_value(1)', args.number):10.3f}")
+    print(f"{'replay set_value(i)':<40} {bench_replay(args.number):10.3f}")
+    record(True)
+
+
+if __name__ == "__main__":
+    main()
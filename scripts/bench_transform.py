@@ -0,0 +1,64 @@
+"""
+Micro-benchmark of transform evaluation.
+
+It measures the time of evaluating transform expressions by walking
+the transform tree (Transform.evaluate) compared to running their
+compiled form (Transform.compile), for several sizes of buffers.
+"""
+
+import os
+import sys
+import timeit
+import argparse
+
+__dirname__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(__dirname__, ".."))
+
+import numpy as np
+from gsp import transform
+from gsp.io.command import record
+
+
+def expressions():
+    """ Return the (name, transform) to benchmark """
+
+    positions = transform.Out("positions")
+    pixel = transform.Pixel()
+    offset = np.array([-1.0, -1.0, 0.0])
+    return [
+        ("offset + 10*pixel", offset + 10*pixel),
+        ("2*P + offset", 2*positions + offset),
+        ("(2*P+1)*(2*P+1) - P/3", (2*positions + 1)*(2*positions + 1) - positions/3),
+        ("(P + (1+2)*4) / 2", (positions + transform.Add(1, 2)*4) / 2) ]
+
+
+def bench(function, variables, number):
+    """ Return the time (in µs) per call of function(variables) """
+
+    times = timeit.repeat(lambda: function(variables), number=number, repeat=5)
+    return 1e6 * min(times) / number
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--number", type=int, default=1000,
+                        help="Number of calls per measure")
+    args = parser.parse_args()
+
+    record(False)
+    print(f"{'Expression':<28} {'Size':>10} {'evaluate µs':>12} {'compiled µs':>12} {'Speedup':>8}")
+    for name, expression in expressions():
+        program = expression.compile()
+        for size in (10, 10_000, 1_000_000):
+            variables = { "positions" : np.random.uniform(-1, 1, (size, 3)),
+                          "dpi" : 100.0 }
+            number = max(1, args.number // max(1, size // 10_000))
+            evaluate = bench(expression.evaluate, variables, number)
+            compiled = bench(program, variables, number)
+            print(f"{name:<28} {size:>10} {evaluate:12.2f} {compiled:12.2f} {evaluate/compiled:7.2f}x")
+    record(True)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 # Authors: Nicolas P .Rougier <nicolas.rougier@gmail.com>
 # License: BSD 3 clause
 import pytest
+import numpy as np
 from gsp import Object
 from gsp.io.convert import register, unregister
 from gsp.io.command import command, Command, CommandQueue
@@ -16,6 +17,24 @@ class Bar(Foo):
     def __init__(self, value : float):
         Foo.__init__(self, value)
 
+class Blob(Object):
+    @command()
+    def __init__(self, small : np.ndarray, large : np.ndarray = None,
+                       noise : np.ndarray = None, data : bytes = None,
+                       name : str = None):
+        Object.__init__(self)
+
+@pytest.fixture
+def queue():
+    """ Recording queue, active for the duration of a test """
+
+    active = CommandQueue.active
+    queue = CommandQueue("test").empty()
+    queue.readonly = False
+    CommandQueue.active = queue
+    yield queue
+    CommandQueue.active = active
+
 def test_io_recording():
     """ Test if commands are recorded """
 
@@ -113,6 +132,29 @@ def test_io_to_json():
     assert commands["parameters"]["value"] == 123*4
 
 
+def test_io_to_text(queue):
+    """ Test streaming export to text with summarized buffers """
+
+    import io
+    import gsp.io.ansi
+    import gsp.io.text
+    import gsp.io.json
+
+    Blob(np.arange(4), np.arange(1000, dtype=np.float32))
+
+    stream = io.StringIO()
+    assert gsp.io.text.dump(queue, stream, limit=256) is None
+    text = stream.getvalue()
+    assert text == gsp.io.text.dump(queue, limit=256)
+    assert "SMALL: [0 1 2 3]" in text
+    assert "LARGE: ndarray(shape=(1000,), dtype=float32, nbytes=4000" in text
+    assert "\033[" not in text and "\033[" in gsp.io.ansi.dump(queue, limit=256)
+    assert "nbytes" not in gsp.io.text.dump(queue)
+
+    # Lazy buffers are summarized without being decoded
+    encoded = gsp.io.json.Encoded("not decodable", "<f4::1", "zlib")
+    assert gsp.io.ansi.format_value(encoded, limit=4).startswith("Encoded(codec=zlib")
+
 def test_io_inheritance():
     """ Test if commands are recorded """
 
@@ -132,3 +174,645 @@ def test_io_inheritance():
 
     assert isinstance(bar.value, float)
     assert isinstance(barload.value, int)
+
+def test_io_call_plan():
+    """ Test if call plan is built once and tracks converters """
+
+    plan = Foo.__init__.__plan__
+    assert plan.keys == ("value",)
+    assert plan.methodname == "__init__"
+
+    unregister("float", "int")
+    with pytest.raises(ValueError):
+        foo = Foo(123.0)
+
+    @register("float", "int")
+    def float_to_int(value):
+        return int(value)
+
+    queue = CommandQueue("active").empty()
+    queue.readonly = False
+    foo = Foo(123.0)
+    assert plan.types["value"] == (int,)
+    assert queue[-1].parameters["value"]() == 123
+
+def test_io_bound_object_default():
+    """ Test if a bound object parameter is not shadowed by its default """
+
+    class Baz(Object):
+        @command()
+        def __init__(self, other : Object = None):
+            Object.__init__(self)
+
+    queue = CommandQueue("active").empty()
+    queue.readonly = False
+    baz = Baz(Baz())
+    assert "other" not in queue[-1].parameters.keys()
+    assert queue[-1].parameters["other(id)"] == queue[0].parameters["id"]
+
+def test_converter_dispatch():
+    """ Test if converters are searched along the MRO and memoized """
+
+    from gsp.io.convert import get_converter
+
+    class Base: pass
+    class Derived(Base): pass
+    class DerivedTwice(Derived): pass
+
+    assert get_converter(DerivedTwice(), "int") is None
+
+    @register("Base", "int")
+    def base_to_int(value):
+        return 1
+
+    assert get_converter(DerivedTwice(), "int") is base_to_int
+    assert get_converter(DerivedTwice, int) is base_to_int
+
+    @register("Derived", "int")
+    def derived_to_int(value):
+        return 2
+
+    assert get_converter(DerivedTwice(), "int") is derived_to_int
+    unregister(("Base", "Derived"), "int")
+    assert get_converter(DerivedTwice(), "int") is None
+
+def test_io_binary(tmp_path, queue):
+    """ Test binary save and zero-copy load """
+
+    import gsp.io.binary
+
+    array = np.arange(12, dtype=np.float32).reshape(3,4)
+    blob = Blob(array, data=b"\x01\x02\x03", name="blob")
+
+    filename = tmp_path / "test.gspb"
+    gsp.io.binary.save(filename, queue)
+    queue = gsp.io.binary.load(filename, queue)
+    parameters = queue[0].parameters
+
+    assert queue[0].classname == "Blob"
+    assert parameters["name"] == "blob"
+    assert bytes(parameters["data"]) == b"\x01\x02\x03"
+    assert np.array_equal(parameters["small"], array)
+    assert parameters["small"].dtype == np.float32
+    assert not parameters["small"].flags.owndata
+    assert parameters["small"].ctypes.data % gsp.io.binary.ALIGNMENT == 0
+
+def test_io_json_sidecar(tmp_path, queue):
+    """ Test JSON save with large buffers in a sidecar file """
+
+    import gsp.io.json
+
+    small, large = np.arange(4, dtype=np.int32), np.arange(1000, dtype=np.float32)
+    blob = Blob(small, large)
+
+    filename = tmp_path / "test.json"
+    gsp.io.json.save(filename, queue, threshold=256)
+    assert (tmp_path / "test.bin").stat().st_size >= large.nbytes
+
+    queue = gsp.io.json.load(filename, queue)
+    parameters = queue[0].parameters
+    assert isinstance(parameters["small"], str)
+    assert isinstance(parameters["large"], gsp.io.json.Blob)
+    assert parameters["large"]._array is None
+    assert np.array_equal(np.asarray(parameters["large"]), large)
+
+def test_io_json_compression(tmp_path, queue):
+    """ Test JSON save with compressed buffers """
+
+    import gsp.io.json
+    from gsp.io import codec
+
+    small = np.arange(4, dtype=np.int32)
+    large = np.repeat(np.arange(10, dtype=np.float32), 1000)
+    noise = np.random.default_rng(1).integers(0, 256, 4096, dtype=np.ubyte)
+    assert codec.choose(noise) is None
+    assert codec.unshuffle(codec.shuffle(large.tobytes(), 4), 4) == large.tobytes()
+
+    for threshold in (None, 16):
+        queue.empty()
+        Blob(small, large, noise)
+
+        filename = tmp_path / "test.json"
+        gsp.io.json.save(filename, queue, threshold, compression="auto", shuffle=True)
+        assert filename.stat().st_size < large.nbytes
+
+        queue = gsp.io.json.load(filename, queue)
+        parameters = queue[0].parameters
+        assert isinstance(parameters["small"], str)
+        assert isinstance(parameters["noise"], str if threshold is None else gsp.io.json.Blob)
+        assert isinstance(parameters["large"], gsp.io.json.Encoded)
+        assert parameters["large"].shuffle == 4
+        assert parameters["large"]._array is None
+        assert np.array_equal(np.asarray(parameters["large"]), large)
+
+def test_io_json_parallel(tmp_path, monkeypatch, queue):
+    """ Test if buffers encoded on a thread pool give the same file """
+
+    import gsp.io.json
+
+    arrays = [np.repeat(np.arange(i, i+10, dtype=np.float32), 100) for i in range(8)]
+    for data in arrays + arrays[:2]:
+        Blob(data)
+
+    monkeypatch.setattr(gsp.io.json, "PARALLEL", 1024)
+    for compression in (None, "zlib"):
+        serial = gsp.io.json.dump(queue, compression=compression, workers=1)
+        assert gsp.io.json.dump(queue, compression=compression, workers=4) == serial
+
+    filename = tmp_path / "test.json"
+    gsp.io.json.save(filename, queue, compression="zlib", workers=4)
+    loaded = gsp.io.json.load(filename, CommandQueue("loaded"), decode=True, workers=4)
+    for loaded_command, data in zip(loaded, arrays):
+        value = loaded_command.parameters["small"]
+        assert value._array is not None
+        assert np.array_equal(np.asarray(value), data)
+
+def test_io_dedup(tmp_path, queue):
+    """ Test if identical buffers are saved once and shared on load """
+
+    import base64
+    import gsp.io.json
+    import gsp.io.binary
+
+    positions = np.random.default_rng(1).uniform(0, 1, (1000,3))
+    colors = np.ones((4,4))
+    Blob(colors, positions), Blob(colors, positions.copy())
+
+    for save, load, suffix in ((gsp.io.json.save, gsp.io.json.load, ".json"),
+                               (gsp.io.binary.save, gsp.io.binary.load, ".gspb")):
+        filename = tmp_path / ("full" + suffix)
+        save(filename, queue, dedup=False)
+        size = filename.stat().st_size
+        expected = load(filename, CommandQueue("expected"))
+        filename = tmp_path / ("dedup" + suffix)
+        save(filename, queue, dedup=True)
+        assert filename.stat().st_size < size - positions.nbytes
+
+        loaded = load(filename, CommandQueue("loaded"))
+        first, second = loaded[0].parameters, loaded[1].parameters
+        for key in ("small", "large"):
+            assert (first[key] is second[key] or
+                    np.shares_memory(np.asarray(first[key]), np.asarray(second[key])))
+        for deduplicated, other in zip(loaded, expected):
+            for key, value in deduplicated.parameters.items():
+                assert type(value) is type(other.parameters[key])
+                assert np.array_equal(np.asarray(value), np.asarray(other.parameters[key]))
+        data = second["large"]
+        if isinstance(data, str):
+            data = base64.b64decode(data)
+        assert np.array_equal(np.frombuffer(data, positions.dtype).reshape(-1, 3), positions)
+
+def test_io_journal(tmp_path, queue):
+    """ Test if journals are appended, recovered and tailed """
+
+    import gsp.io.journal
+
+    filename = tmp_path / "session.gspj"
+
+    Foo(1), Foo(2)
+    journal = gsp.io.journal.Journal(filename, queue, sync=False)
+    assert journal.flush() == 2
+    size = filename.stat().st_size
+    assert journal.flush() == 0
+    Foo(3)
+    assert journal.flush() == 1
+    journal.close()
+    assert filename.stat().st_size < 2*size
+    loaded = gsp.io.journal.load(filename, CommandQueue("loaded"))
+    assert [c.parameters["value"] for c in loaded] == [1, 2, 3]
+    assert [c.id for c in loaded] == [c.id for c in queue]
+    # The loaded queue has become the active one when created
+    CommandQueue.active = queue
+
+    # A torn segment is discarded and previous commands are kept
+    Foo(4)
+    with open(filename, "ab") as stream:
+        stream.write(b"\x00" * 5)
+    with gsp.io.journal.Journal(filename, queue, sync=False) as journal:
+        assert journal.flush() == 1
+    loaded = gsp.io.journal.load(filename, CommandQueue("loaded"))
+    assert [c.parameters["value"] for c in loaded] == [1, 2, 3, 4]
+
+    commands = gsp.io.journal.tail(filename, timeout=0, interval=0)
+    assert [c.parameters["value"] for c in commands] == [1, 2, 3, 4]
+
+    # A new session (whose command ids restart) is appended as a whole
+    first = loaded[0].id
+    session = CommandQueue("session").empty()
+    for i in range(10):
+        session.push(Command("Foo", "__init__", {"id" : i+1, "value" : 10+i}, cid=first+i))
+    with gsp.io.journal.Journal(filename, session, sync=False) as journal:
+        assert journal.flush() == 10
+    loaded = gsp.io.journal.load(filename, CommandQueue("loaded"))
+    assert [c.parameters["value"] for c in loaded] == [1, 2, 3, 4] + list(range(10, 20))
+
+    # A failed append leaves neither a torn segment nor references to
+    # its payloads
+    data = bytes(range(256))
+    good = Command("Shape", "set_data", {"id" : 1, "offset" : 0, "data" : data})
+    bad = Command("Shape", "set_colormap", {"id" : 1, "colormap" : object()})
+    filename = tmp_path / "failed.gspj"
+    with gsp.io.journal.Journal(filename, CommandQueue("empty").empty(), sync=False) as journal:
+        with pytest.raises(TypeError):
+            journal.append([good, bad])
+        assert journal.append([good]) == 1
+    loaded = gsp.io.journal.load(filename, CommandQueue("loaded"))
+    assert len(loaded) == 1 and bytes(loaded[0].parameters["data"]) == data
+
+def test_io_checkpoint(tmp_path, queue):
+    """ Test if a binary file can be loaded until a given command """
+
+    import gsp.io.binary
+    from gsp.core import Buffer
+
+    filename = tmp_path / "session.gspb"
+
+    buffer = Buffer(16, np.dtype(np.float32), None)
+    values = np.zeros(16, np.float32)
+    for i in range(100):
+        foo = Foo(i)
+        update = np.full(4, i, np.float32)
+        buffer.set_data(4*(i % 12), memoryview(update.tobytes()))
+        values[i % 12:i % 12 + 4] = update
+        foo.delete()
+        if i == 74:
+            until, expected = queue[-1].id, values.copy()
+    gsp.io.binary.save(filename, queue, checkpoint=20)
+
+    loaded = gsp.io.binary.load(filename, CommandQueue("loaded"), until=until)
+    assert len(loaded) < 20
+    data = np.zeros(16, np.float32).view(np.ubyte)
+    for command in loaded:
+        if command.methodname == "set_data":
+            offset, update = command.parameters["offset"], command.parameters["data"]
+            data[offset:offset+len(update)] = np.frombuffer(update, np.ubyte)
+        elif command.classname == "core.Buffer":
+            data[...] = np.frombuffer(command.parameters["data"], np.ubyte)
+    assert np.array_equal(data.view(np.float32), expected)
+
+    loaded = gsp.io.binary.load(filename, CommandQueue("loaded"))
+    assert [c.id for c in loaded] == [c.id for c in queue]
+    with pytest.raises(ValueError):
+        gsp.io.binary.load(filename, CommandQueue("loaded"), until=0)
+
+    # Checkpoints only write the bytes changed since the previous one
+    # (the loaded queue has become the active one when created)
+    CommandQueue.active = queue.empty()
+    buffer = Buffer(4096, np.dtype(np.float32), memoryview(bytes(4*4096)))
+    values = np.zeros(4096, np.float32)
+    for i in range(100):
+        buffer.set_data(4*i, memoryview(np.float32(i+1).tobytes()))
+        values[i] = i+1
+    until = queue[-1].id
+    gsp.io.binary.save(filename, queue, checkpoint=10)
+    assert filename.stat().st_size < 4*values.nbytes
+    loaded = gsp.io.binary.load(filename, CommandQueue("loaded"), until=until)
+    data = np.frombuffer(loaded[0].parameters["data"], np.ubyte).copy()
+    for command in loaded[1:]:
+        offset, update = command.parameters["offset"], command.parameters["data"]
+        data[offset:offset+len(update)] = np.frombuffer(update, np.ubyte)
+    assert len(loaded) == 12
+    assert np.array_equal(data.view(np.float32), values)
+
+class Surface(Object):
+    @command()
+    def __init__(self):
+        Object.__init__(self)
+
+class Shape(Object):
+    @command()
+    def __init__(self, nbytes : int):
+        Object.__init__(self)
+        self.data = bytearray(nbytes)
+        self.colormap = None
+        self.model = None
+        self.rendered = {}
+
+    @command()
+    def set_colormap(self, colormap : str):
+        self.colormap = colormap
+
+    @command()
+    def set_data(self, offset : int, data : bytes):
+        self.data[offset:offset+len(data)] = data
+
+    @command()
+    def render(self, viewport : Object, model : int = None):
+        if model is not None:
+            self.model = model
+        self.rendered[viewport.id] = self.model, self.colormap, bytes(self.data)
+
+def test_io_compact(queue):
+    """ Test if queue compaction preserves the final state """
+
+    import sys
+
+    surface = Surface()
+    shape = Shape(8)
+    shape.set_colormap("gray")
+    shape.render(surface)
+    for i in range(5):
+        shape.set_colormap(f"colormap-{i}")
+        shape.set_data(0, bytes([i]*8))
+        shape.render(surface, i)
+    shape.render(surface)
+    shape.set_data(2, b"\xff")
+    shape.set_colormap("magma")
+
+    def replay(commands):
+        Object.objects = {}
+        queue.commands = commands
+        queue.run(sys.modules[__name__])
+        return vars(Object.objects[shape.id])
+
+    commands = list(queue.commands)
+    parameters = [dict(command.parameters) for command in commands]
+    expected = replay(commands)
+    queue.commands = commands
+    queue.compact()
+    assert len(queue) == 9
+    assert [command.parameters for command in commands] == parameters
+    assert replay(queue.commands) == expected
+
+def test_io_dispatcher():
+    """ Test if dispatcher resolves callables once and objects references """
+
+    import sys
+    from gsp.io.command import Dispatcher
+
+    queue = CommandQueue("active").empty()
+    surface = Surface()
+    shape = Shape(4)
+    shape.set_data(0, b"ab")
+    shape.set_data(2, b"cd")
+    shape.render(surface)
+
+    dispatcher = Dispatcher(sys.modules[__name__])
+    queue.readonly = True
+    dispatcher.run(queue.commands)
+    queue.readonly = False
+    replayed = Object.objects[shape.id]
+    assert(replayed is not shape)
+    assert(replayed.rendered[surface.id][2] == b"abcd")
+    assert(dispatcher.resolve("Shape", "__init__") is Shape)
+    assert(dispatcher.method(Shape, "set_data") is Shape.set_data)
+    assert(len(dispatcher._plans) == 4)
+
+def test_io_delete():
+    """ Test if deleting an object records a command and unregisters it """
+
+    import sys
+
+    queue = CommandQueue("active").empty()
+    queue.readonly = False
+    surface = Surface()
+    shape = Shape(4)
+    shape.delete()
+    assert(shape.id not in Object.objects)
+    assert(queue.commands[-1].methodname == "delete")
+
+    queue.run(sys.modules[__name__])
+    assert(surface.id in Object.objects)
+    assert(shape.id not in Object.objects)
+
+def test_io_bounded_queue(tmp_path, queue):
+    """ Test if a bounded queue keeps memory bounded and the session replayable """
+
+    import sys
+
+    # Old commands are spilled to a journal
+    queue.bound(count=16, journal=tmp_path / "spill.gspj")
+    foos = [Foo(i) for i in range(100)]
+    assert len(queue) <= 16
+    session = list(queue.session())
+    assert [c.parameters["value"] for c in session] == list(range(100))
+
+    # Old commands are folded by compaction
+    queue.empty().bound(count=16)
+    surface = Surface()
+    shape = Shape(4)
+    for i in range(100):
+        shape.set_data(0, bytes([i, i, i, i]))
+        shape.render(surface, model=i)
+        assert len(queue) <= 16
+
+    queue.readonly = True
+    queue.run(sys.modules[__name__])
+    queue.readonly = False
+    replayed = Object.objects[shape.id]
+    assert replayed is not shape
+    assert replayed.rendered[surface.id] == (99, None, bytes([99]*4))
+    queue.bound()
+
+def test_io_fanout():
+    """ Test if a queue is executed concurrently with several backends """
+
+    import sys
+    import types
+    import threading
+
+    class Meeting(Object):
+        @command()
+        def __init__(self, name : str):
+            Object.__init__(self)
+
+    # Backends only meet if they run concurrently
+    barrier = threading.Barrier(2, timeout=5)
+    class Waiting(Object):
+        def __init__(self, name : str):
+            Object.__init__(self)
+            barrier.wait()
+
+    backends = [types.ModuleType(name) for name in ("first", "second")]
+    for backend in backends:
+        backend.Meeting, backend.Shape = Waiting, Shape
+
+    queue = CommandQueue("active").empty()
+    queue.readonly = False
+    meeting, shape = Meeting("meeting"), Shape(2)
+    shape.set_data(0, b"ab")
+
+    objects = Object.objects
+    first, second = queue.fanout(backends)
+    assert not barrier.broken
+    assert Object.objects is objects and objects[shape.id] is shape
+    assert first[shape.id] is not second[shape.id]
+    assert first[shape.id].data == second[shape.id].data == b"ab"
+    assert len(queue) == 3
+
+def test_io_namespace():
+    """ Test if namespaces own independent registries and counters """
+
+    import sys
+    import threading
+    from gsp.object import Namespace, OID
+
+    objects = Object.objects
+    first, second = Namespace(), Namespace()
+    with first:
+        foo = Foo(1)
+        with second:
+            bar = Foo(2)
+        assert Object.objects is first.objects
+    assert foo.id == bar.id == 1
+    assert first.objects == {1: foo} and second.objects == {1: bar}
+    assert Object.objects is objects and foo.id not in objects
+
+    def create(namespace):
+        with namespace:
+            for i in range(100):
+                Foo(i)
+    namespaces = [Namespace() for i in range(4)]
+    threads = [threading.Thread(target=create, args=(namespace,))
+               for namespace in namespaces]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    for namespace in namespaces:
+        assert sorted(namespace.objects) == list(range(1, 101))
+
+    # Replay in a namespace
+    queue = CommandQueue("active").empty()
+    queue.readonly = False
+    foo = Foo(3)
+    replay = Namespace()
+    queue.run(sys.modules[__name__], namespace=replay)
+    assert replay.objects[foo.id] is not foo
+    assert replay.objects[foo.id].value == 3
+    replay.clear()
+    assert not replay.objects
+    with replay:
+        assert OID() == 1
+
+def test_io_namespace_queue():
+    """ Test if namespaces record commands in their own queue """
+
+    import sys
+    from gsp.object import Namespace
+
+    active = CommandQueue("active").empty()
+    first, second = Namespace(), Namespace()
+    with first:
+        Foo(1)
+        assert CommandQueue("active") is first.queue
+    with second:
+        Foo(2)
+        Foo(3)
+    assert CommandQueue("active") is active and len(active) == 0
+    assert [command.parameters["id"] for command in first.queue] == [1]
+    assert [command.parameters["id"] for command in second.queue] == [1, 2]
+
+    # Replays are not recorded
+    replays = Namespace(), Namespace()
+    first.queue.run(sys.modules[__name__], namespace=replays[0])
+    second.queue.run(sys.modules[__name__], namespace=replays[1])
+    assert replays[0].objects[1].value == 1
+    assert replays[1].objects[1].value == 2 and replays[1].objects[2].value == 3
+    assert all(len(replay.queue) == 0 for replay in replays)
+    first.clear()
+    assert len(first.queue) == 0
+
+def test_io_profile(tmp_path):
+    """ Test if command executions are profiled """
+
+    import sys
+    import json
+    from gsp.io.profile import Profiler
+
+    queue = CommandQueue("active").empty()
+    queue.readonly = False
+    surface = Surface()
+    shape = Shape(4)
+    shape.set_data(0, b"ab")
+    shape.set_data(2, b"cd")
+    shape.render(surface)
+
+    with Profiler() as profiler:
+        queue.run(sys.modules[__name__], profiler=profiler)
+    assert len(profiler.records) == 5
+    stats = profiler.stats()
+    assert stats["Shape", "set_data"].count == 2
+    assert stats["Shape", "set_data"].payload == 4
+    assert all(record.duration > 0 for record in profiler.records)
+    assert "Shape/set_data" in str(profiler)
+
+    # Temporary allocations are accounted for
+    with Profiler() as temporary:
+        temporary.execute(lambda command: len(bytearray(1 << 20)), queue[0])
+    assert temporary.records[0].allocated >= 1 << 20
+
+    profiler.save(tmp_path / "trace.json")
+    with open(tmp_path / "trace.json") as stream:
+        events = json.load(stream)["traceEvents"]
+    assert [event["args"]["id"] for event in events] == [int(c.id) for c in queue]
+    assert all(event["ph"] == "X" for event in events)
+
+def test_io_weak_registry():
+    """ Test if a weak registry only keeps referenced or replayed objects alive """
+
+    import gc, sys
+    from gsp.object import registry
+    from gsp.io.command import Dispatcher
+
+    queue = CommandQueue("active").empty()
+    queue.readonly = False
+    objects = Object.objects
+    registry(weak=True)
+    try:
+        surface = Surface()
+        shape = Shape(4)
+        shape.render(surface)
+        oid = shape.id
+        del shape
+        gc.collect()
+        assert(oid not in Object.objects)
+        assert(surface.id in Object.objects)
+
+        # Replayed objects are kept alive until they are deleted and
+        # commands are executed as soon as they are available
+        commands = list(queue)
+        Object.objects.clear()
+        def stream():
+            yield from commands[:2]
+            gc.collect()
+            assert(len(Object.objects) == 2)
+            yield from commands[2:]
+        dispatcher = Dispatcher(sys.modules[__name__])
+        dispatcher.run(stream())
+        gc.collect()
+        dispatcher.run(commands[2:])
+        assert(oid in Object.objects)
+        Object.objects[oid].delete()
+        gc.collect()
+        assert(list(Object.objects.keys()) == [surface.id])
+    finally:
+        Object.objects = objects
+
+def test_io_json_iterload(tmp_path):
+    """ Test if JSON commands are streamed with their id and timestamp """
+
+    import io
+    import sys
+    from gsp.io import json
+    from gsp.io.json import iterload, iterparse
+
+    queue = CommandQueue("active").empty()
+    queue.readonly = False
+    surface = Surface()
+    shape = Shape(4)
+    shape.set_colormap("magma")
+    shape.render(surface)
+    commands = list(queue.commands)
+    json.save(tmp_path / "commands.json")
+
+    # Small chunks force commands to be decoded across several reads
+    with open(tmp_path / "commands.json") as stream:
+        assert(len(list(iterparse(stream, chunksize=7))) == len(commands))
+    assert(list(iterparse(io.StringIO('{"commands": [], "gsp_version": "1.0"}'))) == [])
+
+    loaded = list(iterload(tmp_path / "commands.json"))
+    assert([c.id for c in loaded] == [c.id for c in commands])
+    assert([c.timestamp for c in loaded] == [c.timestamp for c in commands])
+
+    Object.objects = {}
+    queue.run(sys.modules[__name__], iterload(tmp_path / "commands.json"))
+    assert(Object.objects[shape.id].rendered[surface.id][1] == "magma")
@@ -0,0 +1,226 @@
+# Package: Graphic Server Protocol / Matplotlib
+# Authors: Nicolas P .Rougier <nicolas.rougier@gmail.com>
+# License: BSD 3 clause
+import pytest
+import numpy as np
+from gsp_matplotlib.core import Buffer
+
+def _replayed(queue):
+    """ Replay a queue with the matplotlib backend and return the replayed objects """
+
+    import gsp_matplotlib
+    from gsp import Object
+
+    objects, Object.objects = Object.objects, {}
+    try:
+        queue.run(gsp_matplotlib)
+        return Object.objects
+    finally:
+        Object.objects = objects
+
+def test_buffer_set_data():
+    """ Check if set_data updates a read-only buffer in place """
+
+    Z = np.arange(4, dtype=np.float32)
+    buffer = Buffer(4, np.dtype(np.float32), Z.tobytes())
+    assert(buffer.version == 0)
+    buffer.set_data(4, np.float32([9,8]).tobytes())
+    array = np.asarray(buffer)
+    assert(np.array_equal(array, [0,9,8,3]))
+    assert(buffer.version == 1)
+    buffer.set_data(0, np.float32([7]).tobytes())
+    assert(np.asarray(buffer) is array)
+    assert(np.array_equal(array, [7,9,8,3]))
+    with pytest.raises(ValueError):
+        buffer.set_data(12, np.float32([1,2]).tobytes())
+
+def test_buffer_set_data_shared():
+    """ Check if set_data writes through to the memory of the source array """
+
+    Z = np.zeros(4, dtype=np.float32)
+    buffer = Buffer(4, np.dtype(np.float32), Z.data)
+    buffer.set_data(8, np.float32([1]).tobytes())
+    assert(Z[2] == 1)
+    assert(buffer.version == 1)
+
+def test_buffer_set_data_overlap():
+    """ Check if set_data copies data overlapping the updated bytes """
+
+    Z = np.arange(4, dtype=np.float32)
+    buffer = Buffer(4, np.dtype(np.float32), Z.data)
+    buffer.set_data(4, Z[:-1].data)
+    assert(np.array_equal(Z, [0,0,1,2]))
+    buffer.set_data(0, Z[1:].data)
+    assert(np.array_equal(Z, [0,1,2,2]))
+
+def test_buffer_set_data_lazy(tmp_path):
+    """ Check if set_data accepts lazy data from a saved queue """
+
+    import gsp
+    from gsp.io.json import Blob, Encoded
+    from gsp.io.command import CommandQueue
+
+    queue = CommandQueue("active").empty()
+    buffer = Buffer(64, np.dtype(np.float32), np.zeros(64, np.float32).tobytes())
+    for index in range(8):
+        buffer.set_data(32*index, np.full(8, index, np.float32).tobytes())
+    expected = np.asarray(buffer).copy()
+
+    # Files are all saved first since loading may replace the active queue
+    options = ({"threshold" : 16}, {"compression" : "zlib"})
+    filenames = [tmp_path / f"set-data-{index}.json" for index in range(len(options))]
+    for filename, kwargs in zip(filenames, options):
+        gsp.io.json.save(filename, queue, **kwargs)
+    for filename in filenames:
+        loaded = gsp.io.json.load(filename, CommandQueue("loaded"))
+        data = [command.parameters["data"] for command in loaded
+                                           if command.methodname == "set_data"]
+        assert(all(isinstance(value, (Blob, Encoded)) for value in data))
+        objects = _replayed(loaded)
+        assert(np.array_equal(np.asarray(objects[buffer.id]), expected))
+    queue.empty()
+
+def test_visual_delete():
+    """ Check if deleting a visual removes it from its viewports """
+
+    import gc, weakref
+    from gsp import Object
+    from gsp_matplotlib import core, visual
+
+    canvas = core.Canvas(64, 64, 100.0)
+    viewport = core.Viewport(canvas, 0, 0, 64, 64, [1,1,1,1])
+    positions = np.zeros((4,3), np.float32)
+    points = visual.Points(positions, 1.0, [0,0,0,1], [0,0,0,1], 0.0)
+    points.render(viewport, np.eye(4), np.eye(4), np.eye(4))
+    assert(len(viewport._axes.collections) > 0)
+
+    points.delete()
+    assert(len(viewport._axes.collections) == 0)
+    assert(points.id not in Object.objects)
+    reference = weakref.ref(points)
+    del points
+    gc.collect()
+    assert(reference() is None)
+
+def _record_scene():
+    """ Record a scene whose positions are updated with set_data """
+
+    from gsp_matplotlib import core, visual
+    from gsp.io.command import CommandQueue
+
+    queue = CommandQueue("active").empty()
+    canvas = core.Canvas(64, 64, 100.0)
+    viewport = core.Viewport(canvas, 0, 0, 64, 64, [1,1,1,1])
+    P = np.random.default_rng(0).uniform(-1, 1, (1000,3)).astype(np.float32)
+    positions = Buffer(P.size, np.dtype(np.float32), P.tobytes())
+    points = visual.Points(positions, 1.0, [0,0,0,1], [0,0,0,1], 0.0)
+    for index in range(4):
+        positions.set_data(1200*index, np.full(100*3, index, np.float32).tobytes())
+    return queue, positions, points
+
+def _replay(filename, positions, points):
+    """ Replay a saved scene and check its final positions """
+
+    import gsp
+    from gsp.io.command import CommandQueue
+
+    expected = np.asarray(positions).copy()
+    loaded = gsp.io.json.load(filename, CommandQueue("loaded"))
+    objects = _replayed(loaded)
+    assert(np.array_equal(np.asarray(objects[positions.id]), expected))
+    assert(objects[points.id]._in_variables["positions"] is objects[positions.id])
+
+def test_replay_sidecar(tmp_path):
+    """ Check if a scene saved with a sidecar file can be replayed """
+
+    import gsp
+
+    queue, positions, points = _record_scene()
+    gsp.io.json.save(tmp_path / "scene.json", queue, threshold=1024)
+    assert((tmp_path / "scene.bin").stat().st_size > 1000*12)
+    _replay(tmp_path / "scene.json", positions, points)
+    queue.empty()
+
+def test_replay_compression(tmp_path):
+    """ Check if a scene saved with compressed buffers can be replayed """
+
+    import gsp
+
+    queue, positions, points = _record_scene()
+    for compression in ("zlib", "auto"):
+        gsp.io.json.save(tmp_path / f"scene-{compression}.json", queue,
+                         compression=compression, shuffle=True)
+    for compression in ("zlib", "auto"):
+        _replay(tmp_path / f"scene-{compression}.json", positions, points)
+    queue.empty()
+
+def test_bounded_queue_fold():
+    """ Check if a bounded queue folds buffer updates into snapshots """
+
+    from gsp.io.command import CommandQueue
+
+    queue = CommandQueue("active").empty().bound(count=6)
+    buffer = Buffer(200, np.dtype(np.float32), np.zeros(200, np.float32).tobytes())
+    creation = queue[-1]
+    parameters = dict(creation.parameters)
+    for index in range(200):
+        buffer.set_data(4*index, np.float32([index]).tobytes())
+        assert(len(queue) <= 6)
+    assert(creation.parameters == parameters)
+    expected = np.asarray(buffer).copy()
+    assert(np.array_equal(expected, np.arange(200)))
+
+    objects = _replayed(queue)
+    assert(np.array_equal(np.asarray(objects[buffer.id]), expected))
+    queue.empty().bound()
+
+def _updates(queue, Z):
+    """ Replay the set_data updates of a tracked array on a zero buffer """
+
+    updates = [command.parameters for command in queue
+               if command.methodname == "set_data"]
+    replica = np.zeros(Z.nbytes, np.ubyte)
+    for parameters in updates:
+        data = np.frombuffer(parameters["data"], np.ubyte)
+        replica[parameters["offset"]:parameters["offset"]+len(data)] = data
+    return updates, replica.view(Z.dtype).reshape(Z.shape)
+
+def test_tracked_inplace():
+    """ Check if in-place operations on tracked arrays record a single set_data """
+
+    from gsp_matplotlib import glm, Tracker
+    from gsp.io.command import CommandQueue
+
+    assert(glm.ndarray.tracked.__tracker_class__ is Tracker)
+    queue = CommandQueue("active").empty()
+    Z = glm.ndarray.tracked(10)
+    assert(Z._tracker.gsp_buffer.id in [command.parameters["id"] for command in queue])
+    Z[...] = 0
+    Z += 1
+    Z[2:5] *= 3
+    Z[5:] -= 1
+    Z[-1] /= 2
+    updates, replica = _updates(queue, Z)
+    assert([(p["offset"], len(p["data"])) for p in updates] ==
+           [(0, 80), (0, 80), (16, 24), (40, 40), (72, 8)])
+    assert(np.array_equal(replica, Z))
+    assert(np.array_equal(Z, [1,1,3,3,3,0,0,0,0,0]))
+    queue.empty()
+
+def test_tracked_computation():
+    """ Check if results of computations on tracked arrays are not tracked """
+
+    from gsp_matplotlib import glm, Tracker
+    from gsp.io.command import CommandQueue
+
+    assert(glm.ndarray.tracked.__tracker_class__ is Tracker)
+    queue = CommandQueue("active").empty()
+    Z = glm.ndarray.tracked(10)
+    Z[...] = 0
+    Y = Z + 1
+    assert(Y._tracker is None)
+    Y[...] = 2
+    updates, replica = _updates(queue, Z)
+    assert(len(updates) == 1)
+    assert(np.array_equal(replica, Z))
+    queue.empty()
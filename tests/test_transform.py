@@ -64,3 +64,195 @@ def test_transform_measure():
     assert(transform.Centimeter())
     assert(transform.Meter())
     assert(transform.Kilometer())
+
+def test_transform_compile():
+    """ Check if compiled transforms evaluate as transforms """
+
+    import numpy as np
+
+    P = transform.Out("positions")
+    T = (2*P + 1)*(2*P + 1) - P/3 + 10*transform.Pixel() + transform.Add(1, 2)*4
+    program = T.compile()
+
+    # Common subexpressions are evaluated once and constants folded
+    assert len(program) == 9
+    for dtype in (np.float64, np.float64, np.float32):
+        variables = { "positions" : np.random.uniform(0, 1, (10, 3)).astype(dtype),
+                      "dpi" : 100.0 }
+        expected = T.evaluate(variables)
+        result = program(variables)
+        assert result.dtype == expected.dtype
+        assert np.allclose(result, expected)
+        assert not np.shares_memory(result, program(variables))
+
+def test_transform_cache():
+    """ Check if transform results are cached until their inputs change """
+
+    import numpy as np
+    from gsp.transform.cache import cache, Cache
+
+    cache.clear()
+    pixel = transform.Pixel()(1.0)
+    first = pixel.evaluate_cached({"dpi" : 100.0})
+    assert pixel.evaluate_cached({"dpi" : 100.0}) is first
+    assert pixel.evaluate_cached({"dpi" : 100.0, "size" : (2, 2)}) == 0.5
+    assert len(cache) == 1
+
+    # Out variables are updated in place and are never cached
+    out = transform.Out("positions")
+    assert out.signature({"positions" : np.zeros(3)}) is None
+
+    # Replaced parameters never match, even if their id is reused
+    item = transform.Transform()
+    item._colors = np.ones(3)
+    key, address = item.signature({}), id(item._colors)
+    item._colors = None
+    for i in range(100):
+        colors = np.zeros(3)
+        if id(colors) == address:
+            break
+    item._colors = colors
+    assert item.signature({}) != key
+
+    # Least recently used results are evicted first
+    lru = Cache(budget=20)
+    transforms = [transform.Transform() for i in range(3)]
+    for i, item in enumerate(transforms):
+        lru.put(item, i, np.zeros(1))
+    lru.put(transforms[0], 0, np.zeros(1))
+    assert lru.get(transforms[1], 1) is None
+    assert lru.get(transforms[0], 0) is not None
+    assert lru.get(transforms[2], 2) is not None
+    assert lru.nbytes == 16
+
+def test_transform_colormap():
+    """ Check if colormap lookup tables match matplotlib colormaps """
+
+    import numpy as np
+    import matplotlib as mpl
+    import matplotlib.pyplot as plt
+    from gsp.transform.colormap import lut
+
+    values = np.random.uniform(-0.5, 1.5, 1000)
+    values[0] = np.nan
+    cmap, norm = plt.get_cmap("magma"), mpl.colors.Normalize(0.0, 1.0)
+    colormap = transform.Colormap("magma", 0.0, 1.0)
+    colormap._buffer = values
+    colors = colormap.evaluate({})
+    assert colors.dtype == np.float32
+    assert np.allclose(colors, cmap(norm(values)), atol=1e-6)
+
+    colormap = transform.Colormap("magma", 0.0, 1.0, dtype="uint8")
+    colormap._buffer = values
+    assert np.array_equal(colormap.evaluate({}), cmap(norm(values), bytes=True))
+    assert lut("magma", 4096).shape == (4097, 4)
+    assert lut("magma") is lut("magma")
+
+    # Listed colormaps are not resampled
+    cmap, norm = plt.get_cmap("tab10"), mpl.colors.Normalize(0.0, 1.0)
+    colormap = transform.Colormap("tab10", 0.0, 1.0)
+    colormap._buffer = values
+    assert lut("tab10").shape == (11, 4)
+    assert np.allclose(colormap.evaluate({}), cmap(norm(values)), atol=1e-6)
+
+def test_transform_colormap_bounds():
+    """ Check if colormap bounds are cached, incremental and robust """
+
+    import numpy as np
+    from gsp.transform.colormap import Bounds
+
+    values = np.random.uniform(0, 1, 100_000)
+    values[0] = 1e9
+
+    # Bounds are cached as long as the signature is unchanged
+    bounds = Bounds()
+    assert bounds.update(values, key=1) == (values.min(), 1e9)
+    assert bounds.update(values[1:], key=1) == (values.min(), 1e9)
+    assert bounds.update(values[1:], key=2)[1] == values[1:].max()
+
+    # Appended values only are taken into account
+    bounds = Bounds()
+    for count in range(10_000, 100_001, 10_000):
+        vmin, vmax = bounds.update(values[:count], append=True)
+    assert (vmin, vmax) == (values.min(), 1e9)
+
+    # Percentiles are estimated from a bounded sample
+    bounds = Bounds(1.0, size=5_000, seed=1)
+    for count in range(10_000, 100_001, 10_000):
+        vmin, vmax = bounds.update(values[:count], append=True)
+    assert len(bounds.sample) == 5_000
+    assert abs(vmin - 0.01) < 0.01 and abs(vmax - 0.99) < 0.01
+
+    colormap = transform.Colormap("gray", norm="percentile")
+    colormap._buffer = values
+    colors = colormap.evaluate({})
+    assert 0.4 < colors[1:,0].mean() < 0.6
+
+def test_transform_light():
+    """ Check if lights shade faces and cache their normals """
+
+    import numpy as np
+    from gsp.transform import light
+
+    class Faces(transform.Transform):
+        faces = np.array([[[0,0,0], [1,0,0], [0,1,0]],
+                          [[1,0,0], [1,1,0], [0,1,0]]], dtype=np.float32)
+        def evaluate(self, variables):
+            return self.faces
+
+    white = transform.Light((0,0,1), (0,0,0,0), (1,1,1,1))(Faces())
+    black = transform.Light((0,0,-1), (0,0,0,0), (1,1,1,1))(Faces())
+    assert np.allclose(white.evaluate({}), 1)
+    assert np.allclose(black.evaluate({})[:,:3], 0)
+
+    # Several lights in a single pass
+    lights = transform.Light([(0,0,1), (0,0,-1)], (0,0,0,0),
+                             [(1,0,0,1), (0,0,1,1)])(Faces())
+    assert np.allclose(lights.evaluate({}), (1,0,0,1))
+
+    # Normals are computed once for a given geometry
+    hits = light.normals.hits
+    lights.evaluate({})
+    assert light.normals.hits == hits + 1
+    assert lights.signature({}) is not None
+
+    # Smooth normals are shared by faces vertices
+    normals, indices = light.face_normals(Faces.faces, smooth=True)
+    assert normals.shape == (4, 3) and indices.shape == (2, 3)
+    smooth = transform.Light((0,0,1), (0,0,0,0), (1,1,1,1), smooth=True)(Faces())
+    assert np.allclose(smooth.evaluate({}), 1)
+
+def test_transform_compile_modified():
+    """ Check if compiled transforms follow modifications of their tree """
+
+    import numpy as np
+    from gsp.io.command import record
+
+    P = transform.Out("positions")
+    variables = { "positions" : np.random.uniform(0, 1, (10, 3)),
+                  "dpi" : 100.0 }
+    T = P*transform.Add(1, 2)
+    program = T.compile()
+    assert program.compiles(T)
+    T.right.set_right(3)
+    assert not program.compiles(T)
+    assert np.allclose(T.compile()(variables), variables["positions"]*4)
+
+    # Arrays may be modified in place and are not folded (arrays
+    # operands are not recorded since they cannot be converted here)
+    record(False)
+    try:
+        offset = np.zeros(3)
+        T = P*transform.Add(offset, 1)
+        program = T.compile()
+        offset[...] = 1
+        assert np.allclose(program(variables), variables["positions"]*2)
+        T = offset + 10*transform.Pixel()
+    finally:
+        record(True)
+
+    # Small trees are evaluated directly (after the first run)
+    program = T.compile()
+    assert np.allclose(program(variables), T.evaluate(variables))
+    assert program.direct
+    assert np.allclose(program(variables), T.evaluate(variables))